@@ -0,0 +1,52 @@
+"""
+Helpers shared by the benchmarks.
+"""
+from importlib import import_module
+
+from sympy import flatten
+
+from riccipy import Metric
+
+# representative entries of the metric catalog, from flat to the most expensive.
+METRICS = (
+    "minkowski_1",
+    "schwarzschild_1",
+    "godel",
+    "robertson_walker_1",
+    "bondi_1",
+    "kerr_1",
+    "kerr_newman_1",
+)
+
+# entries without arbitrary functions of the coordinates, which can be evaluated
+# numerically.
+NUMERICAL_METRICS = (
+    "minkowski_1",
+    "schwarzschild_1",
+    "godel",
+    "kerr_1",
+    "kerr_newman_1",
+)
+
+
+def load(name):
+    """
+    Return the module of a catalog entry.
+    """
+    return import_module("riccipy.metrics." + name)
+
+
+def metric(name, **kwargs):
+    """
+    Return a new metric for a catalog entry, without any computed properties.
+    """
+    spacetime = load(name)
+    return Metric("g", spacetime.coords, spacetime.metric, **kwargs)
+
+
+def arguments(name):
+    """
+    Return the coordinates followed by the variables of a catalog entry.
+    """
+    spacetime = load(name)
+    return tuple(spacetime.coords) + tuple(flatten([spacetime.variables]))
@@ -0,0 +1,54 @@
+"""
+Benchmarks of the curvature properties of Metric.
+
+Each benchmark computes a single property of a new metric, with the properties
+it is computed from already in place.
+"""
+from .common import METRICS, metric
+
+# properties computed in setup for each benchmarked property.
+REQUIRES = {
+    "christoffel": (),
+    "riemann": ("christoffel",),
+    "ricci_tensor": ("christoffel",),
+    "ricci_scalar": ("ricci_tensor",),
+    "einstein": ("ricci_tensor", "ricci_scalar"),
+    "weyl": ("riemann", "ricci_tensor", "ricci_scalar"),
+}
+
+
+class Curvature(object):
+    params = (list(METRICS), list(REQUIRES))
+    param_names = ("metric", "property")
+    # every sample computes the property of a metric created in setup.
+    number = 1
+    repeat = (1, 5, 30.0)
+    timeout = 300
+
+    def setup(self, name, prop):
+        self.g = metric(name, method="components")
+        for required in REQUIRES[prop]:
+            getattr(self.g, required)
+
+    def time_property(self, name, prop):
+        getattr(self.g, prop)
+
+    def peakmem_property(self, name, prop):
+        getattr(self.g, prop)
+
+
+class Christoffel(object):
+    params = (list(METRICS), ["expression", "components"])
+    param_names = ("metric", "method")
+    number = 1
+    repeat = (1, 5, 30.0)
+    timeout = 300
+
+    def setup(self, name, method):
+        self.g = metric(name, method=method)
+
+    def time_christoffel(self, name, method):
+        self.g.christoffel
+
+    def peakmem_christoffel(self, name, method):
+        self.g.christoffel
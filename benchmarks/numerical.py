@@ -0,0 +1,35 @@
+"""
+Benchmarks of compiling and evaluating tensors numerically.
+"""
+import numpy as np
+
+from riccipy import lambdify_tensor
+
+from .common import NUMERICAL_METRICS, arguments, metric
+
+
+class Numerical(object):
+    params = (list(NUMERICAL_METRICS), ["christoffel", "riemann"])
+    param_names = ("metric", "property")
+    timeout = 300
+
+    def setup(self, name, prop):
+        g = metric(name, method="components")
+        self.args = arguments(name)
+        self.array = getattr(g, prop).as_array()
+        self.function = lambdify_tensor(self.args, self.array)
+        # points away from the coordinate singularities of the catalog entries.
+        rng = np.random.default_rng(0)
+        self.points = rng.uniform(2.5, 3.5, (len(self.args), 10 ** 5))
+
+    def time_lambdify_tensor(self, name, prop):
+        lambdify_tensor(self.args, self.array)
+
+    def peakmem_lambdify_tensor(self, name, prop):
+        lambdify_tensor(self.args, self.array)
+
+    def time_batch(self, name, prop):
+        self.function.batch(*self.points)
+
+    def peakmem_batch(self, name, prop):
+        self.function.batch(*self.points)
@@ -0,0 +1,29 @@
+"""
+Benchmarks of evaluating tensor expressions.
+"""
+from riccipy import expand_array, indices
+
+from .common import METRICS, metric
+
+
+class Expressions(object):
+    params = (list(METRICS), [False, True])
+    param_names = ("metric", "sparse")
+    timeout = 300
+
+    def setup(self, name, sparse):
+        g = metric(name, method="components", sparse=sparse)
+        self.riemann = g.riemann
+        self.mu, self.nu, self.si, self.rh = indices("mu nu sigma rho", g)
+
+    def time_covariance_transform(self, name, sparse):
+        self.riemann.cache_clear()
+        self.riemann.covariance_transform(-self.mu, -self.nu, -self.si, -self.rh)
+
+    def time_expand_array(self, name, sparse):
+        mu, nu, si = self.mu, self.nu, self.si
+        expand_array(self.riemann(mu, -nu, -mu, -si), [-nu, -si], sparse=sparse)
+
+    def peakmem_expand_array(self, name, sparse):
+        mu, nu, si = self.mu, self.nu, self.si
+        expand_array(self.riemann(mu, -nu, -mu, -si), [-nu, -si], sparse=sparse)
@@ -5,6 +5,8 @@ RicciPy
 Python library for tensor manipulation in General Relativity
 """
 
+__version__ = "0.3.1"
+
 from .metric import Metric, SpacetimeMetric, load_metric
 from .numerical import lambdify_tensor
 from .tensor import Index, Tensor, expand_array, expand_tensor, indices
@@ -0,0 +1,184 @@
+import hashlib
+import os
+import pickle
+import tempfile
+
+from sympy import srepr
+from sympy.tensor.array import NDimArray
+
+from . import __version__
+from .parallel import _dumps
+from .sparse import build_array, dense_array, nonzero_components
+
+# changed whenever the way entries are stored changes, so that entries stored
+# the old way are not loaded.
+_FORMAT = "2"
+
+
+def default_directory():
+    """
+    Return ``riccipy`` in the user's cache directory.
+    """
+    home = os.path.join(os.path.expanduser("~"), ".cache")
+    return os.path.join(os.environ.get("XDG_CACHE_HOME", home), "riccipy")
+
+
+class CurvatureCache(object):
+    """
+    Class for storing the curvature tensors computed from a metric on disk.
+
+    Entries are keyed by a hash of the metric components, the coordinates and
+    the version of riccipy, so that a metric constructed in a later process
+    reuses the results of an earlier one. Arrays are stored by their nonzero
+    components, and symbols by their names along with their assumptions, so
+    that loaded entries are expressed in the symbols of the loading process.
+
+    Writes go to a temporary file that is atomically moved into place, which
+    makes concurrent processes storing the same entry safe. Once the total size
+    of the stored entries exceeds ``max_size`` bytes, the least recently used
+    entries are evicted.
+
+    Examples
+    --------
+    >>> import tempfile
+    >>> from sympy import diag, sin, symbols
+    >>> from riccipy import Metric
+    >>> from riccipy.cache import CurvatureCache
+    >>> th, ph = symbols('theta phi', real=True)
+    >>> cache = CurvatureCache(tempfile.mkdtemp())
+    >>> g = Metric('g', (th, ph), diag(1, sin(th) ** 2), cache=cache)
+    >>> g.ricci_scalar
+    2
+    >>> h = Metric('h', (th, ph), diag(1, sin(th) ** 2), cache=cache)
+    >>> cache.load(cache.key(h.coords, h.as_array()), 'ricci_scalar')
+    2
+    """
+
+    def __init__(self, directory=None, max_size=2 ** 28):
+        """
+        Create a new CurvatureCache.
+
+        Parameters
+        ----------
+        directory : str
+            Directory to store the entries in. Defaults to ``riccipy`` in the
+            user's cache directory.
+        max_size : int
+            Upper bound on the total size of the stored entries in bytes.
+        """
+        if directory is None:
+            directory = default_directory()
+        os.makedirs(directory, exist_ok=True)
+        self.directory = directory
+        self.max_size = max_size
+
+    def key(self, coords, array):
+        """
+        Return a stable hash identifying a metric.
+
+        Parameters
+        ----------
+        coords : iterable
+            List of ~sympy.Symbol objects the metric is defined with.
+        array : ~sympy.Array
+            Components of the metric.
+        """
+        content = "\n".join(
+            [__version__, _FORMAT, srepr(tuple(coords)), srepr(dense_array(array))]
+        )
+        return hashlib.sha256(content.encode()).hexdigest()
+
+    def load(self, key, name, sparse=False):
+        """
+        Return a stored entry, or None if there is no such entry.
+
+        Parameters
+        ----------
+        key : str
+            Hash of the metric, see ``CurvatureCache.key``.
+        name : str
+            Name of the stored quantity.
+        sparse : bool
+            Whether or not to return arrays as sparse arrays.
+        """
+        path = self._path(key, name)
+        try:
+            with open(path, "rb") as stream:
+                value = pickle.load(stream)
+            # mark the entry as recently used.
+            os.utime(path)
+        except (OSError, EOFError, pickle.UnpicklingError):
+            return None
+        if isinstance(value, tuple):
+            shape, components = value
+            return build_array(components, shape, sparse)
+        return value
+
+    def store(self, key, name, value):
+        """
+        Store an entry, evicting the least recently used entries if needed.
+
+        Parameters
+        ----------
+        key : str
+            Hash of the metric, see ``CurvatureCache.key``.
+        name : str
+            Name of the stored quantity.
+        value : (~sympy.Array, ~sympy.Expr)
+            Array or expression to store.
+        """
+        if isinstance(value, NDimArray):
+            value = (value.shape, nonzero_components(value))
+        try:
+            data = _dumps(value)
+        except (pickle.PicklingError, TypeError, AttributeError):
+            # entries that cannot be written are simply not cached.
+            return
+        fd, temp = tempfile.mkstemp(dir=self.directory, suffix=".tmp")
+        try:
+            with os.fdopen(fd, "wb") as stream:
+                stream.write(data)
+            os.replace(temp, self._path(key, name))
+        except OSError:
+            if os.path.exists(temp):
+                os.remove(temp)
+            return
+        self.evict()
+
+    def evict(self):
+        """
+        Remove the least recently used entries until the total size of the
+        stored entries is within ``max_size``.
+        """
+        entries = []
+        for entry in os.scandir(self.directory):
+            if entry.name.endswith(".pickle"):
+                try:
+                    stat = entry.stat()
+                except FileNotFoundError:
+                    continue
+                entries.append((stat.st_mtime, stat.st_size, entry.path))
+        total = sum(size for _, size, _ in entries)
+        for _, size, path in sorted(entries):
+            if total <= self.max_size:
+                break
+            try:
+                os.remove(path)
+            except FileNotFoundError:
+                # already evicted by another process.
+                pass
+            total -= size
+
+    def clear(self):
+        """
+        Remove all stored entries.
+        """
+        for entry in os.scandir(self.directory):
+            if entry.name.endswith(".pickle"):
+                try:
+                    os.remove(entry.path)
+                except FileNotFoundError:
+                    pass
+
+    def _path(self, key, name):
+        return os.path.join(self.directory, "{}-{}.pickle".format(key, name))
@@ -0,0 +1,271 @@
+import ctypes
+import hashlib
+import os
+import subprocess
+import tempfile
+
+import numpy as np
+
+from sympy import Symbol
+from sympy.printing.ccode import C99CodePrinter
+from sympy.printing.pycode import NumPyPrinter
+
+from .cache import default_directory
+
+
+class CompiledArray(object):
+    """
+    Class for evaluating the components of an array with compiled native code.
+
+    The components are printed as a C function that loops over all points,
+    computing the shared subexpressions once per point. The function is
+    compiled into a shared library with the C compiler given by the ``CC``
+    environment variable, or ``cc``, and loaded with ctypes. Compiled libraries
+    are stored by the hash of their source, so that the same array is only
+    ever compiled once.
+
+    Only real valued components of double precision are supported.
+    """
+
+    def __init__(self, args, replacements, elements, shape, directory=None):
+        """
+        Create a new CompiledArray.
+
+        Parameters
+        ----------
+        args : (list, tuple)
+            Iterable of ~sympy.Symbol objects that specify the order of the arguments.
+        replacements : list
+            Pairs of symbols and the common subexpressions they stand for.
+        elements : list
+            The components of the array in row-major order, in terms of ``args``
+            and the symbols in ``replacements``.
+        shape : tuple
+            Shape of the array.
+        directory : str
+            Directory to store the compiled libraries in. Defaults to ``compiled``
+            in the directory of ~riccipy.cache.CurvatureCache.
+        """
+        if directory is None:
+            directory = os.path.join(default_directory(), "compiled")
+        self.args = tuple(args)
+        self.shape = tuple(shape)
+        self.source = _c_source(self.args, replacements, elements)
+        self.path = _compile(self.source, directory)
+        self._function = ctypes.CDLL(self.path).riccipy_evaluate
+        self._function.restype = None
+
+    def __call__(self, *args):
+        """
+        Evaluate the components at the points given by broadcasting the arguments.
+
+        Returns
+        -------
+        ~numpy.ndarray
+            Array with the broadcast shape of the arguments followed by the shape
+            of the array.
+        """
+        if len(args) != len(self.args):
+            raise ValueError(
+                "expected {} arguments, got {}".format(len(self.args), len(args))
+            )
+        args = [np.asarray(arg, dtype=float) for arg in args]
+        shape = np.broadcast(*args).shape if args else ()
+        size = int(np.prod(shape))
+        values, steps = [], []
+        for arg in args:
+            # scalars are read in place, any other argument is expanded.
+            if arg.size == 1:
+                values.append(np.ascontiguousarray(arg.reshape(1)))
+                steps.append(0)
+            else:
+                values.append(np.ascontiguousarray(np.broadcast_to(arg, shape)))
+                steps.append(1)
+        out = np.zeros(shape + self.shape)
+        pointers = (ctypes.c_void_p * max(len(args), 1))(
+            *[value.ctypes.data for value in values]
+        )
+        self._function(
+            ctypes.c_long(size),
+            pointers,
+            (ctypes.c_long * max(len(args), 1))(*steps),
+            ctypes.c_void_p(out.ctypes.data),
+        )
+        return out
+
+
+class JittedArray(object):
+    """
+    Class for evaluating the components of an array with functions compiled by numba.
+
+    The ``kernel`` attribute is a jitted function taking the values of the
+    arguments at a single point followed by an output array of the shape of the
+    array, into which it writes the nonzero components. It may be called from
+    within other jitted functions.
+
+    Requires numba to be installed.
+    """
+
+    def __init__(self, args, replacements, elements, shape):
+        """
+        Create a new JittedArray.
+
+        Parameters
+        ----------
+        args : (list, tuple)
+            Iterable of ~sympy.Symbol objects that specify the order of the arguments.
+        replacements : list
+            Pairs of symbols and the common subexpressions they stand for.
+        elements : list
+            The components of the array in row-major order, in terms of ``args``
+            and the symbols in ``replacements``.
+        shape : tuple
+            Shape of the array.
+        """
+        from numba import njit
+
+        self.args = tuple(args)
+        self.shape = tuple(shape)
+        self.source = _numba_source(self.args, replacements, elements, self.shape)
+        namespace = {"numpy": np}
+        functions = {}
+        exec(compile(self.source, "<jittedarray>", "exec"), namespace, functions)
+        # the loop over the points refers to the kernel as a global.
+        self.kernel = namespace["_kernel"] = njit(functions["_kernel"])
+        self._loop = njit(functions["_loop"])
+
+    def __call__(self, *args):
+        """
+        Evaluate the components at the points given by broadcasting the arguments.
+
+        Returns
+        -------
+        ~numpy.ndarray
+            Array with the broadcast shape of the arguments followed by the shape
+            of the array.
+        """
+        if len(args) != len(self.args):
+            raise ValueError(
+                "expected {} arguments, got {}".format(len(self.args), len(args))
+            )
+        args = [np.asarray(arg, dtype=float) for arg in args]
+        shape = np.broadcast(*args).shape if args else ()
+        values, steps = [], []
+        for arg in args:
+            # scalars are read in place, any other argument is expanded.
+            if arg.size == 1:
+                values.append(arg.reshape(1))
+                steps.append(0)
+            else:
+                values.append(np.ascontiguousarray(np.broadcast_to(arg, shape)).ravel())
+                steps.append(1)
+        out = np.zeros((int(np.prod(shape)),) + self.shape)
+        self._loop(*values, np.array(steps, dtype=np.int64), out)
+        return out.reshape(shape + self.shape)
+
+
+def _numba_source(args, replacements, elements, shape):
+    printer = NumPyPrinter({"fully_qualified_modules": True, "inline": True})
+    replacements, elements = _positional(args, replacements, elements)
+    params = ["_a{}".format(pos) for pos in range(len(args))]
+    lines = ["def _kernel({}):".format(", ".join(params + ["_out"]))]
+    for sym, value in replacements:
+        lines.append("    {} = {}".format(printer.doprint(sym), printer.doprint(value)))
+    for pos, expr in enumerate(elements):
+        # the output is zero initialized, so zero components are skipped.
+        if expr != 0:
+            idx = ", ".join(map(str, np.unravel_index(pos, shape)))
+            lines.append("    _out[{}] = {}".format(idx, printer.doprint(expr)))
+    values = ["_a{0}[_i * _steps[{0}]]".format(pos) for pos in range(len(args))]
+    lines += [
+        "",
+        "",
+        "def _loop({}):".format(", ".join(params + ["_steps", "_out"])),
+        "    for _i in range(_out.shape[0]):",
+        "        _kernel({})".format(", ".join(values + ["_out[_i]"])),
+        "",
+    ]
+    return "\n".join(lines)
+
+
+def _c_source(args, replacements, elements):
+    printer = C99CodePrinter()
+
+    def doprint(expr):
+        code = printer.doprint(expr)
+        if "\n" in code:
+            # the printer lists unsupported functions in comments.
+            raise ValueError("cannot generate C code for {}".format(expr))
+        return code
+
+    replacements, elements = _positional(args, replacements, elements)
+    size = len(elements)
+    lines = [
+        "#include <math.h>",
+        "",
+        "void riccipy_evaluate(long n, const double **args, const long *steps, double *out)",
+        "{",
+        "    long i;",
+        "    for (i = 0; i < n; i++) {",
+    ]
+    for pos in range(len(args)):
+        lines.append(
+            "        const double _a{0} = args[{0}][i * steps[{0}]];".format(pos)
+        )
+    for sym, value in replacements:
+        lines.append(
+            "        const double {} = {};".format(doprint(sym), doprint(value))
+        )
+    for pos, expr in enumerate(elements):
+        # the output is zero initialized, so zero components are skipped.
+        if expr != 0:
+            lines.append(
+                "        out[{} * i + {}] = {};".format(size, pos, doprint(expr))
+            )
+    lines += ["    }", "}", ""]
+    return "\n".join(lines)
+
+
+def _positional(args, replacements, elements):
+    # name the arguments by position so that the source does not depend on them.
+    names = {arg: Symbol("_a{}".format(pos)) for pos, arg in enumerate(args)}
+    replacements = [(sym, value.xreplace(names)) for sym, value in replacements]
+    elements = [expr.xreplace(names) for expr in elements]
+    generated = set(sym for sym, _ in replacements)
+    exprs = elements + [value for _, value in replacements]
+    unknown = set().union(*[expr.free_symbols for expr in exprs]) - generated
+    unknown -= set(names.values())
+    if unknown:
+        raise ValueError(
+            "components depend on symbols that are not arguments: {}".format(
+                ", ".join(sorted(map(str, unknown)))
+            )
+        )
+    return replacements, elements
+
+
+def _compile(source, directory):
+    compiler = os.environ.get("CC", "cc")
+    command = [compiler, "-O2", "-shared", "-fPIC"]
+    content = "\n".join([" ".join(command), source])
+    name = hashlib.sha256(content.encode()).hexdigest()
+    path = os.path.join(directory, name + ".so")
+    if os.path.exists(path):
+        return path
+    os.makedirs(directory, exist_ok=True)
+    with tempfile.TemporaryDirectory(dir=directory) as build:
+        src = os.path.join(build, name + ".c")
+        lib = os.path.join(build, name + ".so")
+        with open(src, "w") as stream:
+            stream.write(source)
+        result = subprocess.run(
+            command + ["-o", lib, src, "-lm"],
+            stdout=subprocess.PIPE,
+            stderr=subprocess.STDOUT,
+            universal_newlines=True,
+        )
+        if result.returncode != 0:
+            raise RuntimeError("compilation failed:\n{}".format(result.stdout))
+        # concurrent processes compiling the same source replace it atomically.
+        os.replace(lib, path)
+    return path
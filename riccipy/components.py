@@ -0,0 +1,491 @@
+from collections import defaultdict
+from itertools import combinations, combinations_with_replacement, product
+
+from sympy import Add, LeviCivita, Rational, S, diff
+
+from .parallel import parallel_map
+from .sparse import build_array, contract_axis, nonzero_components
+
+
+def christoffel_components(coords, matrix, inverse, sparse=False, workers=None):
+    r"""
+    Compute the Christoffel symbols directly from the components of a metric.
+
+    Only the ``n * n * (n + 1) / 2`` components with :math:`\mu \le \nu` are
+    evaluated, the remainder are filled in by symmetry.
+
+    Parameters
+    ----------
+    coords : iterable
+        List of ~sympy.Symbol objects to differentiate with respect to.
+    matrix : (~sympy.Matrix, ~sympy.Array)
+        Components of the metric with both indices lowered.
+    inverse : (~sympy.Matrix, ~sympy.Array)
+        Components of the metric with both indices raised.
+    sparse : bool
+        Whether or not to return a sparse array.
+    workers : int
+        Number of processes to evaluate the components in. The result does not
+        depend on the number of processes.
+
+    Returns
+    -------
+    ~sympy.Array
+        Components of :math:`\Gamma^\sigma_{\mu\nu}`.
+
+    Examples
+    --------
+    >>> from sympy import diag, symbols
+    >>> from riccipy.components import christoffel_components
+    >>> r, th = symbols('r theta', positive=True)
+    >>> polar = diag(1, r ** 2)
+    >>> christoffel_components((r, th), polar, polar.inv())
+    [[[0, 0], [0, -r]], [[0, 1/r], [1/r, 0]]]
+    """
+    n = len(coords)
+    pairs = list(combinations_with_replacement(range(n), 2))
+    terms = _ChristoffelTerms(coords, matrix, inverse)
+    gamma = {}
+    for (mu, nu), row in zip(pairs, parallel_map(terms, pairs, workers)):
+        for si, value in row:
+            gamma[si, mu, nu] = gamma[si, nu, mu] = value
+    return build_array(gamma, (n, n, n), sparse)
+
+
+class _ChristoffelTerms(object):
+    # the nonzero Christoffel symbols for a pair of lower indices.
+
+    def __init__(self, coords, matrix, inverse):
+        self.coords = coords
+        self.matrix = matrix
+        self.inverse = inverse
+        self.derivatives = {}
+
+    def derivative(self, rho, mu, nu):
+        # each derivative is only taken once, (rho, nu, mu) shares (rho, mu, nu).
+        key = (rho,) + tuple(sorted((mu, nu)))
+        if key not in self.derivatives:
+            self.derivatives[key] = diff(self.matrix[mu, nu], self.coords[rho])
+        return self.derivatives[key]
+
+    def __call__(self, pair):
+        mu, nu = pair
+        n = len(self.coords)
+        half = Rational(1, 2)
+        dg = self.derivative
+        # Christoffel symbols of the first kind, Gamma_{rho mu nu}.
+        lowered = [
+            half * (dg(mu, nu, rho) + dg(nu, rho, mu) - dg(rho, mu, nu))
+            for rho in range(n)
+        ]
+        row = []
+        for si in range(n):
+            terms = [
+                self.inverse[si, rho] * lowered[rho]
+                for rho in range(n)
+                if lowered[rho] != 0 and self.inverse[si, rho] != 0
+            ]
+            if terms:
+                row.append((si, Add(*terms)))
+        return row
+
+
+def riemann_components(coords, gamma, sparse=False, workers=None):
+    r"""
+    Compute the Riemann curvature tensor directly from the Christoffel symbols.
+
+    Only the algebraically independent components are evaluated. Components
+    antisymmetric in the last pair of indices are filled in by their
+    counterpart and those with :math:`\sigma < \mu < \nu` are recovered from
+    the first Bianchi identity:
+
+    .. math::
+        R^\rho_{\sigma\mu\nu} = R^\rho_{\mu\sigma\nu} - R^\rho_{\nu\sigma\mu}
+
+    Parameters
+    ----------
+    coords : iterable
+        List of ~sympy.Symbol objects to differentiate with respect to.
+    gamma : ~sympy.Array
+        Components of :math:`\Gamma^\sigma_{\mu\nu}`, symmetric in the last
+        two indices.
+    sparse : bool
+        Whether or not to return a sparse array.
+    workers : int
+        Number of processes to evaluate the components in. The result does not
+        depend on the number of processes.
+
+    Returns
+    -------
+    ~sympy.Array
+        Components of :math:`R^\rho_{\sigma\mu\nu}`.
+
+    Examples
+    --------
+    >>> from sympy import diag, sin, symbols
+    >>> from riccipy.components import christoffel_components, riemann_components
+    >>> th, ph = symbols('theta phi', real=True)
+    >>> sphere = diag(1, sin(th) ** 2)
+    >>> gamma = christoffel_components((th, ph), sphere, sphere.inv())
+    >>> riemann_components((th, ph), gamma)[0, 1, 0, 1]
+    sin(theta)**2
+    """
+    n = len(coords)
+    independent = []
+    derived = []
+    for rh, si in product(range(n), repeat=2):
+        for mu, nu in combinations(range(n), 2):
+            if si < mu:
+                derived.append((rh, si, mu, nu))
+            else:
+                independent.append((rh, si, mu, nu))
+    terms = _RiemannTerms(coords, nonzero_components(gamma))
+    values = parallel_map(terms, independent, workers)
+    riemann = {}
+    for (rh, si, mu, nu), value in zip(independent, values):
+        if value != 0:
+            riemann[rh, si, mu, nu] = value
+            riemann[rh, si, nu, mu] = -value
+    for rh, si, mu, nu in derived:
+        value = riemann.get((rh, mu, si, nu), S.Zero) - riemann.get(
+            (rh, nu, si, mu), S.Zero
+        )
+        if value != 0:
+            riemann[rh, si, mu, nu] = value
+            riemann[rh, si, nu, mu] = -value
+    return build_array(riemann, (n, n, n, n), sparse)
+
+
+class _RiemannTerms(object):
+    # a component of the Riemann tensor from the nonzero Christoffel symbols.
+
+    def __init__(self, coords, nonzero):
+        self.coords = coords
+        self.nonzero = nonzero
+        self.derivatives = {}
+
+    def dgamma(self, mu, rh, nu, si):
+        # the derivative of Gamma^rh_{nu si} with respect to coords[mu].
+        key = (mu, rh) + tuple(sorted((nu, si)))
+        if key not in self.derivatives:
+            component = self.nonzero.get((rh, nu, si), S.Zero)
+            self.derivatives[key] = diff(component, self.coords[mu])
+        return self.derivatives[key]
+
+    def contract(self, rh, mu, nu, si):
+        # Gamma^rh_{mu la} Gamma^la_{nu si} summed over la.
+        nonzero = self.nonzero
+        return Add(
+            *[
+                nonzero[rh, mu, la] * nonzero[la, nu, si]
+                for la in range(len(self.coords))
+                if (rh, mu, la) in nonzero and (la, nu, si) in nonzero
+            ]
+        )
+
+    def __call__(self, key):
+        rh, si, mu, nu = key
+        return (
+            self.dgamma(mu, rh, nu, si)
+            - self.dgamma(nu, rh, mu, si)
+            + self.contract(rh, mu, nu, si)
+            - self.contract(rh, nu, mu, si)
+        )
+
+
+def ricci_components(riemann, sparse=False):
+    r"""
+    Compute the Ricci tensor by contracting the nonzero components of the
+    Riemann tensor, :math:`R_{\mu\nu} = R^\sigma_{\mu\sigma\nu}`.
+
+    Parameters
+    ----------
+    riemann : ~sympy.Array
+        Components of :math:`R^\rho_{\sigma\mu\nu}`.
+    sparse : bool
+        Whether or not to return a sparse array.
+
+    Returns
+    -------
+    ~sympy.Array
+        Components of :math:`R_{\mu\nu}`.
+    """
+    n = riemann.shape[0]
+    terms = defaultdict(list)
+    for (si, mu, rh, nu), value in nonzero_components(riemann).items():
+        if si == rh:
+            terms[mu, nu].append(value)
+    ricci = {idx: Add(*values) for idx, values in terms.items()}
+    return build_array(ricci, (n, n), sparse)
+
+
+def christoffel_ricci_components(coords, gamma, sparse=False, workers=None):
+    r"""
+    Compute the Ricci tensor directly from the Christoffel symbols, without
+    evaluating the components of the Riemann tensor:
+
+    .. math::
+        R_{\sigma\nu} =
+        \partial_\rho \Gamma^\rho_{\nu\sigma} - \partial_\nu \Gamma^\rho_{\rho\sigma}
+        + \Gamma^\rho_{\rho\lambda} \Gamma^\lambda_{\nu\sigma} - \Gamma^\rho_{\nu\lambda} \Gamma^\lambda_{\rho\sigma}
+
+    Only the components with :math:`\sigma \le \nu` are evaluated, the
+    remainder are filled in by symmetry.
+
+    Parameters
+    ----------
+    coords : iterable
+        List of ~sympy.Symbol objects to differentiate with respect to.
+    gamma : ~sympy.Array
+        Components of :math:`\Gamma^\sigma_{\mu\nu}`, symmetric in the last
+        two indices.
+    sparse : bool
+        Whether or not to return a sparse array.
+    workers : int
+        Number of processes to evaluate the components in. The result does not
+        depend on the number of processes.
+
+    Returns
+    -------
+    ~sympy.Array
+        Components of :math:`R_{\mu\nu}`.
+
+    Examples
+    --------
+    >>> from sympy import diag, sin, symbols
+    >>> from riccipy.components import christoffel_components, christoffel_ricci_components
+    >>> th, ph = symbols('theta phi', real=True)
+    >>> sphere = diag(1, sin(th) ** 2)
+    >>> gamma = christoffel_components((th, ph), sphere, sphere.inv())
+    >>> christoffel_ricci_components((th, ph), gamma)
+    [[1, 0], [0, sin(theta)**2]]
+    """  # noqa: E501
+    n = len(coords)
+    pairs = list(combinations_with_replacement(range(n), 2))
+    terms = _RicciTerms(coords, nonzero_components(gamma))
+    ricci = {}
+    for (si, nu), value in zip(pairs, parallel_map(terms, pairs, workers)):
+        if value != 0:
+            ricci[si, nu] = ricci[nu, si] = value
+    return build_array(ricci, (n, n), sparse)
+
+
+class _RicciTerms(_RiemannTerms):
+    # a component of the Ricci tensor, contracting the Riemann tensor term by term.
+
+    def __call__(self, pair):
+        si, nu = pair
+        # R^nu_{si nu nu} vanishes by antisymmetry.
+        return Add(
+            *[
+                _RiemannTerms.__call__(self, (rh, si, rh, nu))
+                for rh in range(len(self.coords))
+                if rh != nu
+            ]
+        )
+
+
+def weyl_components(
+    matrix, inverse, riemann, ricci, scalar, sparse=False, workers=None
+):
+    r"""
+    Compute the Weyl tensor from the components of the Riemann and Ricci tensors.
+
+    Only the components with :math:`\mu < \nu` are evaluated, the remainder are
+    filled in by antisymmetry.
+
+    Parameters
+    ----------
+    matrix : (~sympy.Matrix, ~sympy.Array)
+        Components of the metric with both indices lowered.
+    inverse : (~sympy.Matrix, ~sympy.Array)
+        Components of the metric with both indices raised.
+    riemann : ~sympy.Array
+        Components of :math:`R^\rho_{\sigma\mu\nu}`.
+    ricci : ~sympy.Array
+        Components of :math:`R_{\mu\nu}`.
+    scalar : ~sympy.Expr
+        The Ricci scalar.
+    sparse : bool
+        Whether or not to return a sparse array.
+    workers : int
+        Number of processes to evaluate the components in. The result does not
+        depend on the number of processes.
+
+    Returns
+    -------
+    ~sympy.Array
+        Components of :math:`C^\rho_{\sigma\mu\nu}`.
+    """
+    n = riemann.shape[0]
+    keys = [
+        (rh, si, mu, nu)
+        for rh, si in product(range(n), repeat=2)
+        for mu, nu in combinations(range(n), 2)
+    ]
+    terms = _WeylTerms(matrix, inverse, riemann, ricci, scalar)
+    weyl = {}
+    for (rh, si, mu, nu), value in zip(keys, parallel_map(terms, keys, workers)):
+        if value != 0:
+            weyl[rh, si, mu, nu] = value
+            weyl[rh, si, nu, mu] = -value
+    return build_array(weyl, (n, n, n, n), sparse)
+
+
+class _WeylTerms(object):
+    # a component of the Weyl tensor with its first index raised.
+
+    def __init__(self, matrix, inverse, riemann, ricci, scalar):
+        n = riemann.shape[0]
+        ricci = nonzero_components(ricci)
+        inverse = nonzero_components(inverse)
+        mixed = defaultdict(list)
+        for (mu, la), value in ricci.items():
+            for rh in range(n):
+                if (la, rh) in inverse:
+                    mixed[mu, rh].append(value * inverse[la, rh])
+        self.n = n
+        self.matrix = nonzero_components(matrix)
+        self.riemann = nonzero_components(riemann)
+        self.ricci = ricci
+        # the Ricci tensor with its second index raised, R_mu^rh.
+        self.mixed = {idx: Add(*values) for idx, values in mixed.items()}
+        self.scalar = scalar
+
+    def __call__(self, key):
+        rh, si, mu, nu = key
+        n = self.n
+        g = self.matrix
+        ricci = self.ricci
+        mixed = self.mixed
+        delta_mu = S.One if rh == mu else S.Zero
+        delta_nu = S.One if rh == nu else S.Zero
+        return (
+            self.riemann.get(key, S.Zero)
+            - Rational(1, n - 2)
+            * (
+                delta_mu * ricci.get((nu, si), S.Zero)
+                - delta_nu * ricci.get((mu, si), S.Zero)
+                + g.get((si, nu), S.Zero) * mixed.get((mu, rh), S.Zero)
+                - g.get((si, mu), S.Zero) * mixed.get((nu, rh), S.Zero)
+            )
+            + Rational(1, (n - 2) * (n - 1))
+            * (delta_mu * g.get((nu, si), S.Zero) - delta_nu * g.get((mu, si), S.Zero))
+            * self.scalar
+        )
+
+
+def riemann_square(matrix, inverse, riemann):
+    r"""
+    Compute the square :math:`R_{\rho\sigma\mu\nu} R^{\rho\sigma\mu\nu}` of a
+    tensor with the symmetries of the Riemann tensor, such as the Weyl tensor.
+
+    Only the products of components with :math:`\rho < \sigma`,
+    :math:`\mu < \nu` and :math:`(\rho, \sigma) \le (\mu, \nu)` are summed,
+    weighted by the number of components they stand for.
+
+    Parameters
+    ----------
+    matrix : (~sympy.Matrix, ~sympy.Array)
+        Components of the metric with both indices lowered.
+    inverse : (~sympy.Matrix, ~sympy.Array)
+        Components of the metric with both indices raised.
+    riemann : ~sympy.Array
+        Components of :math:`R^\rho_{\sigma\mu\nu}`.
+
+    Examples
+    --------
+    >>> from sympy import diag, sin, symbols
+    >>> from riccipy.components import (
+    ...     christoffel_components, riemann_components, riemann_square)
+    >>> th, ph = symbols('theta phi', real=True)
+    >>> sphere = diag(1, sin(th) ** 2)
+    >>> gamma = christoffel_components((th, ph), sphere, sphere.inv())
+    >>> riemann_square(sphere, sphere.inv(), riemann_components((th, ph), gamma))
+    4
+    """
+    lowered, raised = _lowered_raised(matrix, inverse, riemann, (1, 2, 3))
+    terms = []
+    for (rh, si, mu, nu), value in lowered.items():
+        if rh < si and mu < nu and (rh, si) <= (mu, nu):
+            if (rh, si, mu, nu) in raised:
+                weight = 4 if (rh, si) == (mu, nu) else 8
+                terms.append(weight * value * raised[rh, si, mu, nu])
+    return Add(*terms)
+
+
+def ricci_square(inverse, ricci):
+    r"""
+    Compute the square :math:`R_{\mu\nu} R^{\mu\nu}` of the Ricci tensor.
+
+    Only the products of components with :math:`\mu \le \nu` are summed,
+    weighted by the number of components they stand for.
+
+    Parameters
+    ----------
+    inverse : (~sympy.Matrix, ~sympy.Array)
+        Components of the metric with both indices raised.
+    ricci : ~sympy.Array
+        Components of :math:`R_{\mu\nu}`.
+    """
+    lowered = nonzero_components(ricci)
+    inverse = nonzero_components(inverse)
+    raised = contract_axis(contract_axis(lowered, inverse, 0), inverse, 1)
+    return Add(
+        *[
+            (1 if mu == nu else 2) * value * raised[mu, nu]
+            for (mu, nu), value in lowered.items()
+            if mu <= nu and (mu, nu) in raised
+        ]
+    )
+
+
+def pontryagin_density(matrix, inverse, riemann, density):
+    r"""
+    Compute the Chern-Pontryagin invariant of a 4-dimensional metric:
+
+    .. math::
+        {}^*R R = \frac{1}{2} \epsilon^{\alpha\beta\gamma\delta}
+        R_{\alpha\beta\mu\nu} R^{\mu\nu}{}_{\gamma\delta}
+
+    where :math:`\epsilon^{0123} = 1 / \sqrt{|g|}` in the order of the
+    coordinates. Of the 24 orderings of the indices of the Levi-Civita symbol,
+    only 3 are evaluated, and only the components with :math:`\mu < \nu` are
+    summed.
+
+    Parameters
+    ----------
+    matrix : (~sympy.Matrix, ~sympy.Array)
+        Components of the metric with both indices lowered.
+    inverse : (~sympy.Matrix, ~sympy.Array)
+        Components of the metric with both indices raised.
+    riemann : ~sympy.Array
+        Components of :math:`R^\rho_{\sigma\mu\nu}`.
+    density : ~sympy.Expr
+        The density :math:`\sqrt{|g|}` of the metric.
+    """
+    lowered, raised = _lowered_raised(matrix, inverse, riemann, (1,))
+    terms = []
+    # the pairings of complementary index pairs, each standing for 8 orderings.
+    for (al, be), (ga, de) in [((0, 1), (2, 3)), ((0, 2), (1, 3)), ((0, 3), (1, 2))]:
+        contraction = Add(
+            *[
+                lowered[al, be, mu, nu] * raised[mu, nu, ga, de]
+                for mu, nu in combinations(range(4), 2)
+                if (al, be, mu, nu) in lowered and (mu, nu, ga, de) in raised
+            ]
+        )
+        terms.append(LeviCivita(al, be, ga, de) * contraction)
+    return 8 * Add(*terms) / density
+
+
+def _lowered_raised(matrix, inverse, riemann, positions):
+    # the components with the first index lowered and those with the indices at
+    # positions raised.
+    mixed = nonzero_components(riemann)
+    inverse = nonzero_components(inverse)
+    lowered = contract_axis(mixed, nonzero_components(matrix), 0)
+    raised = mixed
+    for pos in positions:
+        raised = contract_axis(raised, inverse, pos)
+    return lowered, raised
@@ -0,0 +1,289 @@
+from multiprocessing import Pool
+
+import numpy as np
+
+from sympy import Array
+
+from .numerical import NumericalArray
+from .sparse import nonzero_components
+
+# Dormand-Prince coefficients.
+_NODES = (
+    (),
+    (1 / 5,),
+    (3 / 40, 9 / 40),
+    (44 / 45, -56 / 15, 32 / 9),
+    (19372 / 6561, -25360 / 2187, 64448 / 6561, -212 / 729),
+    (9017 / 3168, -355 / 33, 46732 / 5247, 49 / 176, -5103 / 18656),
+)
+_WEIGHTS = (35 / 384, 0, 500 / 1113, 125 / 192, -2187 / 6784, 11 / 84)
+_ERRORS = (
+    71 / 57600,
+    0,
+    -71 / 16695,
+    71 / 1920,
+    -17253 / 339200,
+    22 / 525,
+    -1 / 40,
+)
+
+
+class Geodesics(object):
+    r"""
+    Class for integrating batches of geodesics of a metric.
+
+    The Christoffel symbols are compiled once. Only their nonzero components
+    with :math:`\mu \le \nu` enter the geodesic equation
+
+    .. math::
+        \frac{d^2 x^\sigma}{d\lambda^2}
+        = -\Gamma^\sigma_{\mu\nu} \frac{dx^\mu}{d\lambda} \frac{dx^\nu}{d\lambda}
+
+    which is integrated for all geodesics at once with an adaptive Dormand-Prince
+    scheme, each geodesic taking its own step size.
+
+    Examples
+    --------
+    >>> import numpy as np
+    >>> from sympy import diag, sin, symbols
+    >>> from riccipy import Metric
+    >>> from riccipy.geodesic import Geodesics
+    >>> t, r, th, ph = symbols('t r theta phi', real=True)
+    >>> M = symbols('M', positive=True)
+    >>> f = 1 - 2 * M / r
+    >>> g = Metric('g', (t, r, th, ph), diag(-f, 1 / f, r ** 2, r ** 2 * sin(th) ** 2),
+    ...            method='components')
+    >>> geodesics = Geodesics(g, {M: 1})
+    >>> x0 = np.array([[0, 10, np.pi / 2, 0]])
+    >>> u0 = geodesics.normalize(x0, [[0, 0, 0, 1 / np.sqrt(700)]], -1)
+    >>> x, u = geodesics.integrate(x0, u0, np.linspace(0, 100, 5))
+    >>> np.allclose(x[0, :, 1], 10)
+    True
+    """
+
+    def __init__(self, metric, params=None, backend="python"):
+        """
+        Create a new Geodesics object.
+
+        Parameters
+        ----------
+        metric : ~riccipy.metric.Metric
+            Metric to compute the geodesics of.
+        params : dict
+            Values of the symbols other than the coordinates that the metric
+            depends on.
+        backend : str
+            Backend used for evaluating the Christoffel symbols, see
+            ~riccipy.numerical.NumericalArray.
+        """
+        params = dict(params or {})
+        gamma = nonzero_components(metric.christoffel.as_array())
+        keys = sorted(key for key in gamma if key[1] <= key[2])
+        self.metric = metric
+        self.coords = tuple(metric.coords)
+        self.params = params
+        self._args = self.coords + tuple(params)
+        self._values = [float(value) for value in params.values()]
+        self._setup(keys, [gamma[key] for key in keys], backend)
+        self._matrix = NumericalArray(self._args, metric.as_array(), backend=backend)
+
+    def _setup(self, keys, components, backend):
+        self._keys = keys
+        self._components = components
+        self._backend = backend
+        n = len(self.coords)
+        # a pair of distinct lower indices appears twice in the sum.
+        self._mu = np.array([key[1] for key in keys], dtype=int)
+        self._nu = np.array([key[2] for key in keys], dtype=int)
+        self._factors = np.array([1.0 if mu == nu else 2.0 for _, mu, nu in keys])
+        self._selection = np.zeros((len(keys), n))
+        for pos, key in enumerate(keys):
+            self._selection[pos, key[0]] = 1.0
+        self._christoffel = None
+        if keys:
+            self._christoffel = NumericalArray(
+                self._args, Array(components), backend=backend
+            )
+
+    def acceleration(self, x, u):
+        """
+        Return the second derivatives of the coordinates along the geodesics.
+
+        Parameters
+        ----------
+        x : ~numpy.ndarray
+            Coordinates of the points, of shape ``(N, dim)``.
+        u : ~numpy.ndarray
+            Tangent vectors at the points, of shape ``(N, dim)``.
+        """
+        if self._christoffel is None:
+            return np.zeros_like(u)
+        gamma = self._christoffel(*x.T, *self._values).reshape(len(x), -1)
+        terms = gamma * self._factors * u[:, self._mu] * u[:, self._nu]
+        return -terms.dot(self._selection)
+
+    def normalize(self, x, u, norm):
+        r"""
+        Solve for the time component of tangent vectors of a given norm.
+
+        The first component of ``u`` is replaced by the larger solution of
+        :math:`g_{\mu\nu} u^\mu u^\nu = \mathrm{norm}`, which is the future
+        directed one when the first coordinate is time.
+
+        Parameters
+        ----------
+        x : ~numpy.ndarray
+            Coordinates of the points, of shape ``(N, dim)``.
+        u : ~numpy.ndarray
+            Tangent vectors at the points, of shape ``(N, dim)``.
+        norm : float
+            Norm of the tangent vectors, 0 for null geodesics and the sign of the
+            metric for timelike directions for timelike geodesics.
+        """
+        x = np.atleast_2d(np.asarray(x, dtype=float))
+        u = np.array(np.atleast_2d(u), dtype=float)
+        g = self._matrix(*x.T, *self._values).reshape(len(x), len(self.coords), -1)
+        space = u[:, 1:]
+        a = g[:, 0, 0]
+        b = 2 * np.einsum("ni,ni->n", g[:, 0, 1:], space)
+        c = np.einsum("ni,nij,nj->n", space, g[:, 1:, 1:], space) - norm
+        root = np.sqrt(b ** 2 - 4 * a * c)
+        u[:, 0] = np.maximum((-b + root) / (2 * a), (-b - root) / (2 * a))
+        return u
+
+    def integrate(
+        self,
+        x0,
+        u0,
+        lambdas,
+        rtol=1e-8,
+        atol=1e-10,
+        max_steps=100000,
+        workers=None,
+    ):
+        """
+        Integrate geodesics from their initial points and tangent vectors.
+
+        Geodesics along which the step size drops to zero, for example on
+        reaching a singularity, are terminated and the remainder of their
+        trajectory is filled with nan.
+
+        Parameters
+        ----------
+        x0 : ~numpy.ndarray
+            Initial coordinates, of shape ``(N, dim)``.
+        u0 : ~numpy.ndarray
+            Initial tangent vectors, of shape ``(N, dim)``.
+        lambdas : ~numpy.ndarray
+            Increasing values of the affine parameter to return the trajectories
+            at, starting with the value at the initial points.
+        rtol, atol : float
+            Relative and absolute tolerances of the local error of each step.
+        max_steps : int
+            Maximum number of steps for each geodesic.
+        workers : int
+            Number of processes to split the geodesics between. By default, all
+            geodesics are integrated in the current process.
+
+        Returns
+        -------
+        tuple
+            Coordinates and tangent vectors along the geodesics, each of shape
+            ``(N, len(lambdas), dim)``.
+        """
+        x0 = np.atleast_2d(np.asarray(x0, dtype=float))
+        u0 = np.atleast_2d(np.asarray(u0, dtype=float))
+        lambdas = np.asarray(lambdas, dtype=float)
+        if x0.shape != u0.shape or x0.shape[1] != len(self.coords):
+            raise ValueError(
+                "expected initial values of shape (N, {}), received {} and {}".format(
+                    len(self.coords), x0.shape, u0.shape
+                )
+            )
+        options = (rtol, atol, max_steps)
+        if workers is None or workers <= 1:
+            return self._integrate(x0, u0, lambdas, *options)
+        chunks = [
+            (x, u, lambdas) + options
+            for x, u in zip(np.array_split(x0, workers), np.array_split(u0, workers))
+            if len(x)
+        ]
+        state = (self._args, self._keys, self._components, self._backend)
+        with Pool(workers, _init_worker, (state, self._values)) as pool:
+            results = pool.starmap(_integrate_chunk, chunks)
+        x = np.concatenate([result[0] for result in results])
+        u = np.concatenate([result[1] for result in results])
+        return x, u
+
+    def _derivative(self, y):
+        n = len(self.coords)
+        return np.concatenate([y[:, n:], self.acceleration(y[:, :n], y[:, n:])], axis=1)
+
+    def _step(self, y, h):
+        # a single Dormand-Prince step, returning the solution and the error.
+        k = [self._derivative(y)]
+        for nodes in _NODES[1:]:
+            dy = sum(a * ki for a, ki in zip(nodes, k))
+            k.append(self._derivative(y + h[:, None] * dy))
+        y_new = y + h[:, None] * sum(b * ki for b, ki in zip(_WEIGHTS, k))
+        k.append(self._derivative(y_new))
+        error = h[:, None] * sum(e * ki for e, ki in zip(_ERRORS, k))
+        return y_new, error
+
+    def _integrate(self, x0, u0, lambdas, rtol, atol, max_steps):
+        n = len(self.coords)
+        count = len(x0)
+        y = np.concatenate([x0, u0], axis=1)
+        out = np.full((count, len(lambdas), 2 * n), np.nan)
+        out[:, 0] = y
+        lam = np.full(count, lambdas[0])
+        step = np.full(count, (lambdas[-1] - lambdas[0]) / 100)
+        target = np.ones(count, dtype=int)
+        steps = np.zeros(count, dtype=int)
+        active = np.arange(count) if len(lambdas) > 1 else np.arange(0)
+        while len(active):
+            remaining = lambdas[target[active]] - lam[active]
+            h = np.minimum(step[active], remaining)
+            with np.errstate(all="ignore"):
+                y_new, error = self._step(y[active], h)
+                scale = atol + rtol * np.maximum(np.abs(y[active]), np.abs(y_new))
+                norm = np.sqrt(np.mean((error / scale) ** 2, axis=1))
+            finite = np.isfinite(norm) & np.all(np.isfinite(y_new), axis=1)
+            accepted = finite & (norm <= 1)
+            done = active[accepted]
+            reached = accepted & (h >= remaining)
+            y[done] = y_new[accepted]
+            lam[done] += h[accepted]
+            lam[active[reached]] = lambdas[target[active[reached]]]
+            out[active[reached], target[active[reached]]] = y[active[reached]]
+            target[active[reached]] += 1
+            # grow or shrink the step, keeping the current step if it was cut
+            # short by an output point.
+            factor = np.where(finite, 0.9 * np.maximum(norm, 1e-10) ** -0.2, 0.1)
+            factor = np.clip(factor, 0.1, 5.0)
+            grow = ~(accepted & (h < step[active]))
+            step[active[grow]] = h[grow] * factor[grow]
+            steps[active] += 1
+            tiny = step[active] <= 1e-12 * np.maximum(1.0, np.abs(lam[active]))
+            finished = (target[active] >= len(lambdas)) | tiny
+            finished |= steps[active] >= max_steps
+            active = active[~finished]
+        return out[:, :, :n], out[:, :, n:]
+
+
+_worker_geodesics = None
+
+
+def _init_worker(state, values):
+    global _worker_geodesics
+    args, keys, components, backend = state
+    geodesics = Geodesics.__new__(Geodesics)
+    geodesics.coords = args[: len(args) - len(values)]
+    geodesics._args = args
+    geodesics._values = values
+    geodesics._setup(keys, components, backend)
+    _worker_geodesics = geodesics
+
+
+def _integrate_chunk(x0, u0, lambdas, rtol, atol, max_steps):
+    return _worker_geodesics._integrate(x0, u0, lambdas, rtol, atol, max_steps)
@@ -1,9 +1,32 @@
+import os
 from collections import namedtuple
 
-from sympy import Array, Pow, Rational, S, Symbol, ones, sympify, tensorproduct, zeros
-from sympy.tensor.tensor import TensorIndexType
-
+from sympy import (
+    Array,
+    ImmutableSparseNDimArray,
+    Pow,
+    Rational,
+    S,
+    Symbol,
+    ones,
+    sympify,
+    tensorproduct,
+    zeros,
+)
+from sympy.tensor.tensor import TensorIndexType, TensorSymmetry
+
+from .components import (
+    christoffel_components,
+    christoffel_ricci_components,
+    pontryagin_density,
+    ricci_components,
+    ricci_square,
+    riemann_components,
+    riemann_square,
+    weyl_components,
+)
 from .partial import PartialDerivative, CovariantHead
+from .sparse import determinant_components
 from .tensor import AbstractTensor, Tensor, expand_array, indices
 
 
@@ -28,14 +51,48 @@ class Metric(AbstractTensor, TensorIndexType):
     _MetricId = namedtuple("MetricId", ["name", "antisym"])
 
     is_Metric = True
+    # incremented whenever the components change, so that arrays with indices
+    # raised or lowered by the metric are not reused afterwards.
+    _generation = 0
+    _methods = ("expression", "components")
+    _curvature = (
+        "christoffel",
+        "riemann",
+        "ricci_tensor",
+        "ricci_scalar",
+        "weyl",
+        "einstein",
+    )
+    _invariants = (
+        "kretschmann",
+        "weyl_square",
+        "ricci_square",
+        "chern_pontryagin",
+    )
+    _determinant = None
     _christoffel = None
     _riemann = None
     _ricci_tensor = None
     _ricci_scalar = None
     _weyl = None
     _einstein = None
-
-    def __new__(cls, symbol, coords, matrix, **kwargs):
+    _kretschmann = None
+    _weyl_square = None
+    _ricci_square = None
+    _chern_pontryagin = None
+
+    def __new__(
+        cls,
+        symbol,
+        coords,
+        matrix,
+        method="expression",
+        sparse=False,
+        cache=None,
+        workers=None,
+        simplification=None,
+        **kwargs
+    ):
         """
         Create a new Metric object.
 
@@ -49,12 +106,35 @@ class Metric(AbstractTensor, TensorIndexType):
         matrix : (list, tuple, ~sympy.Matrix, ~sympy.Array)
             Matrix representation of the tensor to be used in substitution.
             Can be of any type that is acceptable by ~sympy.Array.
+        method : str
+            Engine used for computing the Christoffel symbols. ``expression``
+            evaluates the defining tensor expression whereas ``components``
+            computes each component directly from the metric and its inverse.
+        sparse : bool
+            Whether or not to store only the nonzero components of the metric
+            and of the curvature tensors computed from it.
+        cache : ~riccipy.cache.CurvatureCache
+            On-disk cache to load the curvature tensors from, or to store them
+            in once computed.
+        workers : int
+            Number of processes to evaluate the components of the curvature
+            tensors in. By default, they are evaluated in the current process.
+        simplification : ~riccipy.simplification.SimplificationPolicy
+            Simplifications applied to each curvature tensor once computed, before
+            the tensors depending on it are computed from it. By default, the
+            components are left as computed.
         """
         array = Array(matrix)
         if array.rank() != 2 or array.shape[0] != array.shape[1]:
             raise ValueError(
                 "matrix must be square, received matrix of shape {}".format(array.shape)
             )
+        if method not in cls._methods:
+            raise ValueError(
+                "method must be one of {}, received {}".format(cls._methods, method)
+            )
+        if sparse:
+            array = ImmutableSparseNDimArray(array)
         if isinstance(symbol, str):
             symbol = Symbol(symbol)
         obj = TensorIndexType.__new__(
@@ -69,6 +149,10 @@ class Metric(AbstractTensor, TensorIndexType):
         obj._metric = Tensor(obj.name, array, obj, covar=(-1, -1))
         obj._repl[obj] = array
         obj._args = (symbol, coords, matrix)
+        obj.method = method
+        obj.cache = cache
+        obj.workers = workers
+        obj.simplification = simplification
         return obj
 
     def __getattr__(self, attr):
@@ -83,15 +167,106 @@ class Metric(AbstractTensor, TensorIndexType):
         return self.metric.__getitem__(keys)
 
     def subs(self, sub_dict):
+        """
+        Use a dictionary to replace symbols/variables in the metric.
+
+        When neither the replaced symbols nor their replacements depend on the
+        coordinates, substitution commutes with differentiation and is applied
+        to the curvature tensors computed so far. Otherwise they are discarded
+        and recomputed when next accessed.
+
+        Parameters
+        ----------
+        sub_dict : dict
+            Dictionary that maps symbols to expressions.
+
+        Examples
+        --------
+        >>> from sympy import diag, sin, symbols
+        >>> from riccipy import Metric
+        >>> th, ph, a = symbols('theta phi a', positive=True)
+        >>> g = Metric('g', (th, ph), diag(a ** 2, a ** 2 * sin(th) ** 2))
+        >>> g.ricci_scalar
+        2/a**2
+        >>> g.subs({a: 2})
+        >>> g.ricci_scalar
+        1/2
+        """
         self.metric.subs(sub_dict)
         self._array = self._array.subs(sub_dict)
+        self._inverse = None
         self._repl[self] = self._array
-        self._christoffel = None
-        self._riemann = None
-        self._ricci_tensor = None
-        self._ricci_scalar = None
-        self._weyl = None
-        self._einstein = None
+        self._generation += 1
+        if self._determinant is not None:
+            self._determinant = self._determinant.subs(sub_dict)
+        coords = set(self.coords)
+        commutes = all(
+            not (sympify(old).free_symbols | sympify(new).free_symbols) & coords
+            for old, new in dict(sub_dict).items()
+        )
+        for name in self._curvature + self._invariants:
+            attr = "_" + name
+            value = getattr(self, attr)
+            if value is None:
+                continue
+            if not commutes:
+                setattr(self, attr, None)
+            elif isinstance(value, Tensor):
+                value.subs(sub_dict)
+            else:
+                setattr(self, attr, value.subs(sub_dict))
+
+    def compute(self, *names, workers=None):
+        """
+        Compute curvature tensors, distributing the evaluation of their components
+        over a pool of processes.
+
+        The components are evaluated in the same order and by the same formulas as
+        in a single process, so the results are identical.
+
+        Parameters
+        ----------
+        names : str
+            Names of the properties to compute, such as ``"riemann"`` or ``"weyl"``.
+            Defaults to all of the curvature tensors.
+        workers : int
+            Number of processes to use. Defaults to the number of CPUs.
+
+        Returns
+        -------
+        tuple
+            The computed properties, in the order of ``names``.
+        """
+        names = names or self._curvature
+        for name in names:
+            if name not in self._curvature + self._invariants:
+                raise ValueError(
+                    "names must be among {}, received {}".format(
+                        self._curvature + self._invariants, name
+                    )
+                )
+        previous = self.workers
+        self.workers = workers or os.cpu_count()
+        try:
+            return tuple(getattr(self, name) for name in names)
+        finally:
+            self.workers = previous
+
+    def _load_cached(self, name):
+        if self.cache is None:
+            return None
+        key = self.cache.key(self.coords, self._array)
+        return self.cache.load(key, name, sparse=self.is_sparse)
+
+    def _store_cached(self, name, value):
+        if self.cache is not None:
+            key = self.cache.key(self.coords, self._array)
+            self.cache.store(key, name, value)
+
+    def _simplified(self, name, value):
+        if self.simplification is None:
+            return value
+        return self.simplification.apply(name, value, workers=self.workers)
 
     def density(self, weight=S.One):
         return Pow(abs(self.determinant), Rational(weight, 2))
@@ -122,7 +297,18 @@ class Metric(AbstractTensor, TensorIndexType):
 
     @property
     def determinant(self):
-        return self.as_matrix().det()
+        """
+        Returns the determinant of the metric.
+
+        The metric is split into the blocks that are not coupled by nonzero
+        components, see :func:`riccipy.sparse.determinant_components`. The result
+        is stored until the metric changes.
+        """
+        if self._determinant is None:
+            self._determinant = determinant_components(
+                self.as_components(), self._array.shape[0]
+            )
+        return self._determinant
 
     @property
     def partial(self):
@@ -140,18 +326,40 @@ class Metric(AbstractTensor, TensorIndexType):
         .. math::
             \Gamma^\sigma_{\mu\nu} =
             \frac{1}{2} g^{\sigma\rho} (\partial_\mu g_{\nu\rho} + \partial_\nu g_{\rho\mu} - \partial_\rho g_{\mu\nu})
+
+        When the metric was created with ``method="components"``, the symbols are
+        computed component-wise rather than through the tensor expression above.
         """  # noqa: E501
         if self._christoffel is None:
-            mu, nu, si, rh = indices("mu nu sigma rho", self)
-            d = self.partial
-            g = self.metric
-            gamma = (
-                Rational(1, 2)
-                * g(si, rh)
-                * (d(-mu) * g(-nu, -rh) + d(-nu) * g(-rh, -mu) - d(-rh) * g(-mu, -nu))
+            syms = self._load_cached("christoffel")
+            if syms is None:
+                if self.method == "components":
+                    syms = christoffel_components(
+                        self.coords,
+                        self.as_array(),
+                        self.metric.as_inverse(),
+                        sparse=self.is_sparse,
+                        workers=self.workers,
+                    )
+                else:
+                    mu, nu, si, rh = indices("mu nu sigma rho", self)
+                    d = self.partial
+                    g = self.metric
+                    gamma = (
+                        Rational(1, 2)
+                        * g(si, rh)
+                        * (
+                            d(-mu) * g(-nu, -rh)
+                            + d(-nu) * g(-rh, -mu)
+                            - d(-rh) * g(-mu, -nu)
+                        )
+                    )
+                    syms = expand_array(gamma, [si, -mu, -nu])
+                syms = self._simplified("christoffel", syms)
+                self._store_cached("christoffel", syms)
+            self._christoffel = Tensor(
+                "\u0393", syms, self, covar=(1, -1, -1), sparse=self.is_sparse
             )
-            syms = expand_array(gamma, [si, -mu, -nu])
-            self._christoffel = Tensor("\u0393", syms, self, covar=(1, -1, -1))
         return self._christoffel
 
     @property
@@ -163,20 +371,21 @@ class Metric(AbstractTensor, TensorIndexType):
             R^\rho_{\sigma\mu\nu} =
             \partial_\mu \Gamma^\rho_{\nu\sigma} - \partial_\nu \Gamma^\rho_{\mu\sigma}
             + \Gamma^\rho_{\mu\lambda} \Gamma^\lambda_{\nu\sigma} - \Gamma^\rho_{\nu\lambda} \Gamma^\lambda_{\mu\sigma}
+
+        Only the algebraically independent components are evaluated, see
+        :func:`riccipy.components.riemann_components`.
         """
         if self._riemann is None:
-            mu, nu, si, rh, la = indices("mu nu sigma rho lambda", self)
-            d = self.partial
-            gamma = self.christoffel
-            R = (
-                d(-mu) * gamma(rh, -nu, -si)
-                - d(-nu) * gamma(rh, -mu, -si)
-                + gamma(rh, -mu, -la) * gamma(la, -nu, -si)
-                - gamma(rh, -nu, -la) * gamma(la, -mu, -si)
-            )
-            res = expand_array(R, [rh, -si, -mu, -nu])
+            res = self._load_cached("riemann")
+            if res is None:
+                gamma = self.christoffel.as_array()
+                res = riemann_components(
+                    self.coords, gamma, sparse=self.is_sparse, workers=self.workers
+                )
+                res = self._simplified("riemann", res)
+                self._store_cached("riemann", res)
             self._riemann = Tensor(
-                "R", res, self, symmetry=(2, 2), covar=(1, -1, -1, -1)
+                "R", res, self, symmetry=TensorSymmetry.riemann(), covar=(1, -1, -1, -1)
             )
         return self._riemann
 
@@ -187,12 +396,31 @@ class Metric(AbstractTensor, TensorIndexType):
 
         .. math::
             R_{\mu\nu} = R^\sigma_{\mu\sigma\nu}
+
+        When the Riemann tensor has already been computed, its nonzero components
+        are summed, see :func:`riccipy.components.ricci_components`. Otherwise the
+        Ricci tensor is computed directly from the Christoffel symbols, see
+        :func:`riccipy.components.christoffel_ricci_components`.
         """
         if self._ricci_tensor is None:
-            mu, nu, si = indices("mu nu sigma", self)
-            R = self.riemann
-            res = expand_array(R(si, -mu, -si, -nu), [-mu, -nu])
-            self._ricci_tensor = Tensor("R", res, self, covar=(-1, -1))
+            res = self._load_cached("ricci_tensor")
+            if res is None:
+                if self._riemann is not None:
+                    res = ricci_components(
+                        self.riemann.as_array(), sparse=self.is_sparse
+                    )
+                else:
+                    res = christoffel_ricci_components(
+                        self.coords,
+                        self.christoffel.as_array(),
+                        sparse=self.is_sparse,
+                        workers=self.workers,
+                    )
+                res = self._simplified("ricci_tensor", res)
+                self._store_cached("ricci_tensor", res)
+            self._ricci_tensor = Tensor(
+                "R", res, self, covar=(-1, -1), sparse=self.is_sparse
+            )
         return self._ricci_tensor
 
     @property
@@ -204,10 +432,14 @@ class Metric(AbstractTensor, TensorIndexType):
             R = R^\mu_\mu
         """
         if self._ricci_scalar is None:
-            mu, nu = indices("mu nu", self)
-            g = self.metric
-            RR = self.ricci_tensor
-            res = expand_array(g(-mu, -nu) * RR(mu, nu))
+            res = self._load_cached("ricci_scalar")
+            if res is None:
+                mu, nu = indices("mu nu", self)
+                g = self.metric
+                RR = self.ricci_tensor
+                res = expand_array(g(-mu, -nu) * RR(mu, nu))
+                res = self._simplified("ricci_scalar", res)
+                self._store_cached("ricci_scalar", res)
             self._ricci_scalar = res
         return self._ricci_scalar
 
@@ -220,6 +452,9 @@ class Metric(AbstractTensor, TensorIndexType):
             C_{\rho\sigma\mu\nu} =
             R_{\rho\sigma\mu\nu} - \frac{2}{(n - 2)} (g_{\rho[\mu} R_{\nu]\sigma} - g_{\sigma[\mu} R_{\nu]\rho})
             + \frac{2}{(n - 1)(n - 2)} g_{\rho[\mu} g_{\nu]\sigma} R
+
+        Only the components antisymmetric in the last pair of indices are
+        evaluated, see :func:`riccipy.components.weyl_components`.
         """
         if self._weyl is None:
             n = self.dim
@@ -232,29 +467,35 @@ class Metric(AbstractTensor, TensorIndexType):
             elif n == 3:
                 res = tensorproduct(zeros(3, 3), zeros(3, 3))
                 self._weyl = Tensor(
-                    "C", res, self, symmetry=(2, 2), covar=(1, -1, -1, -1)
+                    "C",
+                    res,
+                    self,
+                    symmetry=TensorSymmetry.riemann(),
+                    covar=(1, -1, -1, -1),
+                    sparse=self.is_sparse,
                 )
                 return self._weyl
-            c1 = Rational(1, n - 2)
-            c2 = Rational(1, (n - 2) * (n - 1))
-            mu, nu, si, rh = indices("mu nu sigma rho", self)
-            R = self.riemann
-            RR = self.ricci_tensor
-            RRR = self.ricci_scalar
-            g = self.metric
-            C = (
-                R(rh, -si, -mu, -nu)
-                - c1
-                * (
-                    g(rh, -mu) * RR(-nu, -si)
-                    - g(rh, -nu) * RR(-mu, -si)
-                    + g(-si, -nu) * RR(-mu, rh)
-                    - g(-si, -mu) * RR(-nu, rh)
+            res = self._load_cached("weyl")
+            if res is None:
+                res = weyl_components(
+                    self.as_array(),
+                    self.metric.as_inverse(),
+                    self.riemann.as_array(),
+                    self.ricci_tensor.as_array(),
+                    self.ricci_scalar,
+                    sparse=self.is_sparse,
+                    workers=self.workers,
                 )
-                + c2 * (g(rh, -mu) * g(-nu, -si) - g(rh, -nu) * g(-mu, -si)) * RRR
+                res = self._simplified("weyl", res)
+                self._store_cached("weyl", res)
+            self._weyl = Tensor(
+                "C",
+                res,
+                self,
+                symmetry=TensorSymmetry.riemann(),
+                covar=(1, -1, -1, -1),
+                sparse=self.is_sparse,
             )
-            res = expand_array(C, [rh, -si, -mu, -nu])
-            self._weyl = Tensor("C", res, self, symmetry=(2, 2), covar=(1, -1, -1, -1))
         return self._weyl
 
     @property
@@ -266,14 +507,114 @@ class Metric(AbstractTensor, TensorIndexType):
             G_{\mu\nu} = R_{\mu\nu} - \frac{1}{2} R g_{\mu\nu}
         """
         if self._einstein is None:
-            mu, nu = indices("mu nu", self)
-            g = self.metric
-            R = self.ricci_tensor
-            RR = self.ricci_scalar
-            res = expand_array(R(-mu, -nu) - Rational(1, 2) * RR * g(-mu, -nu))
-            self._einstein = Tensor("G", res, self, covar=(-1, -1))
+            res = self._load_cached("einstein")
+            if res is None:
+                mu, nu = indices("mu nu", self)
+                g = self.metric
+                R = self.ricci_tensor
+                RR = self.ricci_scalar
+                res = expand_array(R(-mu, -nu) - Rational(1, 2) * RR * g(-mu, -nu))
+                res = self._simplified("einstein", res)
+                self._store_cached("einstein", res)
+            self._einstein = Tensor(
+                "G", res, self, covar=(-1, -1), sparse=self.is_sparse
+            )
         return self._einstein
 
+    @property
+    def kretschmann(self):
+        r"""
+        Returns the Kretschmann scalar using the formula:
+
+        .. math::
+            K = R_{\rho\sigma\mu\nu} R^{\rho\sigma\mu\nu}
+
+        Only the independent products are summed, see
+        :func:`riccipy.components.riemann_square`.
+        """
+        if self._kretschmann is None:
+            self._kretschmann = self._invariant(
+                "kretschmann",
+                lambda: riemann_square(
+                    self.as_array(), self.as_inverse(), self.riemann.as_array()
+                ),
+            )
+        return self._kretschmann
+
+    @property
+    def weyl_square(self):
+        r"""
+        Returns the square of the Weyl tensor using the formula:
+
+        .. math::
+            C_{\rho\sigma\mu\nu} C^{\rho\sigma\mu\nu}
+
+        Only the independent products are summed, see
+        :func:`riccipy.components.riemann_square`.
+        """
+        if self._weyl_square is None:
+            self._weyl_square = self._invariant(
+                "weyl_square",
+                lambda: riemann_square(
+                    self.as_array(), self.as_inverse(), self.weyl.as_array()
+                ),
+            )
+        return self._weyl_square
+
+    @property
+    def ricci_square(self):
+        r"""
+        Returns the square of the Ricci tensor using the formula:
+
+        .. math::
+            R_{\mu\nu} R^{\mu\nu}
+        """
+        if self._ricci_square is None:
+            self._ricci_square = self._invariant(
+                "ricci_square",
+                lambda: ricci_square(self.as_inverse(), self.ricci_tensor.as_array()),
+            )
+        return self._ricci_square
+
+    @property
+    def chern_pontryagin(self):
+        r"""
+        Returns the Chern-Pontryagin invariant of a 4-dimensional metric using
+        the formula:
+
+        .. math::
+            {}^*R R = \frac{1}{2} \epsilon^{\alpha\beta\gamma\delta}
+            R_{\alpha\beta\mu\nu} R^{\mu\nu}{}_{\gamma\delta}
+
+        with :math:`\epsilon^{0123} = 1 / \sqrt{|g|}`, see
+        :func:`riccipy.components.pontryagin_density`.
+        """
+        if self._chern_pontryagin is None:
+            n = self.dim
+            if n != 4:
+                raise ValueError(
+                    "the Chern-Pontryagin invariant is only defined in dimension 4. {} is of dimension {}".format(
+                        self, n
+                    )
+                )
+            self._chern_pontryagin = self._invariant(
+                "chern_pontryagin",
+                lambda: pontryagin_density(
+                    self.as_array(),
+                    self.as_inverse(),
+                    self.riemann.as_array(),
+                    self.density(),
+                ),
+            )
+        return self._chern_pontryagin
+
+    def _invariant(self, name, compute):
+        res = self._load_cached(name)
+        if res is None:
+            res = self._simplified(name, compute())
+            self._store_cached(name, res)
+        return res
+
 
 class SpacetimeMetric(Metric):
     """
@@ -291,8 +632,28 @@ class SpacetimeMetric(Metric):
         return obj
 
     def reverse_signature(self):
-        self._array *= -1
-        self._replacement_dict = {self: self._array}
+        """
+        Change the sign of the metric, and with it the sign convention for
+        timelike and spacelike vectors.
+
+        Of the curvature tensors and invariants computed so far only the Ricci
+        scalar changes sign, the remaining ones are unaffected by the change.
+        Their arrays with raised and lowered indices do change and are
+        recomputed when next requested.
+        """
+        array = -self._array
+        self.metric._set_array(array)
+        self._array = array
+        self._inverse = None
+        self._repl[self] = array
+        if self._determinant is not None:
+            self._determinant *= (-1) ** self._array.shape[0]
+        if self._ricci_scalar is not None:
+            self._ricci_scalar = -self._ricci_scalar
+        for name in self._curvature:
+            value = getattr(self, "_" + name)
+            if isinstance(value, Tensor):
+                value.cache_clear()
         self.is_timelike = not self.is_timelike
         self.is_spacelike = not self.is_spacelike
         return self.signature
@@ -305,14 +666,14 @@ class SpacetimeMetric(Metric):
         return tuple(sig)
 
 
-def load_metric(symbol, name, coords=None, notes=None, timelike=False):
+def load_metric(symbol, name, coords=None, notes=None, timelike=False, cache=None):
     from .metrics import data
 
     spacetime = data(name, coords=coords, notes=notes)
     if isinstance(spacetime, list):
         spacetime = spacetime[0]
     metric = SpacetimeMetric(
-        symbol, spacetime["coords"], spacetime["metric"], timelike=False
+        symbol, spacetime["coords"], spacetime["metric"], timelike=False, cache=cache
     )
     if timelike:
         metric.reverse_signature()
@@ -1,32 +1,102 @@
+import ast
+import json
+import os
 import pkgutil
-from itertools import repeat
+import re
+from collections import defaultdict
+from functools import lru_cache
+from importlib import import_module
 from sympy import flatten
 
+INDEX_PATH = os.path.join(os.path.dirname(__file__), "index.json")
+
 
 def string_list(strlist):
     return ", ".join(strlist) if isinstance(strlist, list) else strlist
 
 
 class MetricData(dict):
-    def __init__(self, doc):
-        import yaml
+    def __init__(self, doc, module=None):
+        if isinstance(doc, str):
+            import yaml
 
-        super().__init__(yaml.safe_load(doc))
+            doc = yaml.safe_load(doc)
+        super().__init__(doc)
         doc_items = [string_list(val) for val in self.values()]
         self.__doc__ = "\n".join(doc_items)
+        self.module = module
+
+    def load(self):
+        """
+        Import the module defining the metric and add its components to the entry.
+        """
+        if "metric" not in self:
+            module = import_module(__name__ + "." + self.module)
+            self["metric"] = module.metric
+            self["coords"] = module.coords
+            self["variables"] = module.variables
+            self["functions"] = module.functions
+        return self
+
+
+def _module_names():
+    return sorted(info.name for info in pkgutil.iter_modules(__path__))
+
+
+def _module_docstring(name):
+    # read the docstring from the source so that the module is not imported.
+    with open(os.path.join(os.path.dirname(__file__), name + ".py")) as stream:
+        return ast.get_docstring(ast.parse(stream.read()), clean=False)
+
+
+def build_index():
+    """
+    Parse the docstrings of all metric modules without importing them.
+
+    Returns
+    -------
+    dict
+        The names of all metric modules under ``modules`` and the parsed
+        docstrings of those that have one under ``entries``.
+    """
+    import yaml
+
+    modules = _module_names()
+    entries = []
+    for name in modules:
+        doc = _module_docstring(name)
+        if doc:
+            entries.append({"module": name, "data": yaml.safe_load(doc.lower())})
+    return {"modules": modules, "entries": entries}
+
 
+def write_index(path=INDEX_PATH):
+    """
+    Regenerate the prebuilt index of the metric catalog.
+    """
+    with open(path, "w") as stream:
+        json.dump(build_index(), stream, indent=1)
+        stream.write("\n")
 
-metric_data = []
 
-for module_info in pkgutil.iter_modules(__path__, __name__ + "."):
-    module = __import__(module_info.name, fromlist="dummy")
-    if module.__doc__:
-        entry = MetricData(module.__doc__.lower())
-        entry["metric"] = module.metric
-        entry["coords"] = module.coords
-        entry["variables"] = module.variables
-        entry["functions"] = module.functions
-        metric_data.append(entry)
+def load_index():
+    """
+    Return the prebuilt index of the metric catalog, rebuilding it from the
+    module sources if it is missing or out of date.
+    """
+    try:
+        with open(INDEX_PATH) as stream:
+            index = json.load(stream)
+    except (OSError, ValueError):
+        index = None
+    if index is None or index.get("modules") != _module_names():
+        index = build_index()
+    return index
+
+
+metric_data = [
+    MetricData(entry["data"], entry["module"]) for entry in load_index()["entries"]
+]
 
 
 def compare_filter(entries, value, key):
@@ -39,57 +109,214 @@ def compare_filter(entries, value, key):
     return filter(select, entries)
 
 
-def find(sub=None, symmetries=None, coords=None, notes=None):
-    entries = metric_data
+_FIELDS = ("name", "symmetry", "coordinates", "notes", "references")
 
-    if symmetries:
-        for symmetry in flatten([symmetries]):
-            entries = compare_filter(entries, symmetry, "symmetry")
 
-    if coords:
-        entries = compare_filter(entries, coords, "coordinates")
+class CatalogIndex(object):
+    """
+    Inverted index over the entries of the metric catalog.
 
-    if notes:
-        for note in flatten([notes]):
-            entries = compare_filter(entries, note, "notes")
+    Every field is indexed by its distinct values and the free text of the
+    entries by their words, so that a query only scans the vocabulary of the
+    catalog instead of every entry. Results are memoized per query term.
+    """
 
-    if sub is None:
-        retval = map(MetricData.__getitem__, entries, repeat("name"))
-    else:
-        retval = [entry["name"] for entry in entries if sub.lower() in entry.__doc__]
+    def __init__(self, entries):
+        self.entries = entries
+        self.all = frozenset(range(len(entries)))
+        self.fields = {key: defaultdict(set) for key in _FIELDS}
+        self.tokens = defaultdict(set)
+        for pos, entry in enumerate(entries):
+            for key in _FIELDS:
+                if key in entry:
+                    self.fields[key][string_list(entry[key])].add(pos)
+            for token in _tokenize(entry.__doc__):
+                self.tokens[token].add(pos)
+        self._cache = {}
 
-    retval = list(set(retval))
-    retval.sort()
-    return retval
+    def exact(self, key, value):
+        """
+        Return the positions of the entries whose field equals a value.
+        """
+        return frozenset(self.fields[key].get(value.lower(), ()))
 
+    def field(self, key, value):
+        """
+        Return the positions of the entries whose field contains a value.
+        """
+        value = value.lower()
+        if (key, value) not in self._cache:
+            matches = set()
+            for text, positions in self.fields[key].items():
+                if value in text:
+                    matches |= positions
+            self._cache[key, value] = frozenset(matches)
+        return self._cache[key, value]
 
-def data(name, coords=None, notes=None):
-    entries = [metric for metric in metric_data if metric["name"] == name.lower()]
-    if not entries:
-        raise KeyError("metric {} not found".format(name))
+    def text(self, sub):
+        """
+        Return the positions of the entries whose description contains a string.
+        """
+        sub = sub.lower()
+        if (None, sub) not in self._cache:
+            # every word of the string is part of a word of a matching entry.
+            candidates = self.all
+            for word in _tokenize(sub):
+                positions = set()
+                for token, entries in self.tokens.items():
+                    if word in token:
+                        positions |= entries
+                candidates = candidates & positions
+            self._cache[None, sub] = frozenset(
+                pos for pos in candidates if sub in self.entries[pos].__doc__
+            )
+        return self._cache[None, sub]
+
+
+def _tokenize(text):
+    return set(re.findall(r"\w+", text))
+
+
+@lru_cache(maxsize=None)
+def catalog_index():
+    """
+    Return the inverted index over ``metric_data``, building it on first use.
+    """
+    return CatalogIndex(metric_data)
 
-    if coords:
-        entries = compare_filter(entries, coords, "coordinates")
 
-    if notes:
-        for note in flatten([notes]):
-            entries = compare_filter(entries, note, "notes")
+class Query(object):
+    """
+    Class for boolean queries on the metric catalog.
 
-    entries = list(entries)
+    A query matches the entries satisfying all of its terms. Queries are
+    combined with ``&``, ``|`` and negated with ``~``.
+
+    Examples
+    --------
+    >>> from riccipy.metrics import Query, find
+    >>> find(Query(symmetries='maximal') & ~Query(coords='cartesian'))
+    ['anti-de sitter', 'de sitter', 'minkowski']
+    """
+
+    def __init__(
+        self,
+        sub=None,
+        name=None,
+        symmetries=None,
+        coords=None,
+        notes=None,
+        references=None,
+    ):
+        """
+        Create a new Query.
+
+        Parameters
+        ----------
+        sub : str
+            Substring of the description of the metric.
+        name : str
+            Name of the metric.
+        symmetries : (str, list)
+            Substrings of the symmetries of the metric.
+        coords : (str, list)
+            Substrings of the coordinates the metric is given in.
+        notes : (str, list)
+            Substrings of the notes on the metric.
+        references : (str, list)
+            Substrings of the references for the metric.
+        """
+        terms = []
+        if sub:
+            terms.append(("text", sub))
+        if name:
+            terms.append(("name", name))
+        for key, values in (
+            ("symmetry", symmetries),
+            ("coordinates", coords),
+            ("notes", notes),
+            ("references", references),
+        ):
+            if values:
+                terms.extend((key, value) for value in flatten([values]))
+        self.op = "and"
+        self.args = tuple(terms)
+
+    @classmethod
+    def _combine(cls, op, *args):
+        obj = cls()
+        obj.op = op
+        obj.args = args
+        return obj
+
+    def __and__(self, other):
+        return self._combine("and", self, other)
+
+    def __or__(self, other):
+        return self._combine("or", self, other)
+
+    def __invert__(self):
+        return self._combine("not", self)
+
+    def matches(self, index=None):
+        """
+        Return the positions in ``metric_data`` of the matching entries.
+        """
+        if index is None:
+            index = catalog_index()
+        if self.op == "or":
+            return self.args[0].matches(index) | self.args[1].matches(index)
+        if self.op == "not":
+            return index.all - self.args[0].matches(index)
+        result = index.all
+        for term in self.args:
+            if isinstance(term, Query):
+                result = result & term.matches(index)
+            elif term[0] == "text":
+                result = result & index.text(term[1])
+            elif term[0] == "name":
+                result = result & index.exact(*term)
+            else:
+                result = result & index.field(*term)
+        return result
+
+    def entries(self):
+        """
+        Return the matching entries in catalog order.
+        """
+        return [metric_data[pos] for pos in sorted(self.matches())]
+
+
+def find(sub=None, symmetries=None, coords=None, notes=None):
+    if isinstance(sub, Query):
+        query = sub & Query(symmetries=symmetries, coords=coords, notes=notes)
+    else:
+        query = Query(sub, symmetries=symmetries, coords=coords, notes=notes)
+    return sorted(set(entry["name"] for entry in query.entries()))
+
+
+def _select(name, coords=None, notes=None):
+    if not catalog_index().exact("name", name):
+        raise KeyError("metric {} not found".format(name))
+    return Query(name=name, coords=coords, notes=notes).entries()
+
+
+def data(name, coords=None, notes=None):
+    entries = [entry.load() for entry in _select(name, coords=coords, notes=notes)]
     if len(entries) == 1:
         return entries[0]
     return entries
 
 
 def coordinate_types(name, notes=None):
-    entries = data(name, notes=notes)
-    if not isinstance(entries, list):
-        return entries.get("coordinates")
+    entries = _select(name, notes=notes)
+    if len(entries) == 1:
+        return entries[0].get("coordinates")
     return set([entry.get("coordinates") for entry in entries])
 
 
 def variations(name, coords=None):
-    entries = data(name, coords=coords)
-    if not isinstance(entries, list):
-        return entries.get("notes")
+    entries = _select(name, coords=coords)
+    if len(entries) == 1:
+        return entries[0].get("notes")
     return set([entry.get("notes") for entry in entries])
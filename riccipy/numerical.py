@@ -1,12 +1,21 @@
-from functools import partial
-from itertools import starmap
+import linecache
 from types import FunctionType
 
 import numpy as np
 
-from sympy import Array, lambdify, flatten
+from sympy import Array, Dummy, S, cse, flatten, lambdify, numbered_symbols, sympify
+from sympy.printing.pycode import (
+    MpmathPrinter,
+    NumPyPrinter,
+    PythonCodePrinter,
+    SciPyPrinter,
+    SymPyPrinter,
+)
+from sympy.tensor.array import NDimArray
 from sympy.tensor.tensor import TensExpr
 
+from .codegen import CompiledArray, JittedArray
+from .sparse import dense_array
 from .tensor import expand_array
 
 
@@ -16,10 +25,16 @@ class NumericalArray(object):
 
     Calling instances of this class will result in the evaluation of a lambda function
     that returns a numerically valued array representing the results of the individual
-    component expressions.
+    component expressions. When called with arrays of values, the components are
+    evaluated for all points at once, see ``NumericalArray.batch``.
 
     Furthermore, instances may also be used to access specific components in a manner
     identical to accessing the components of an numpy array.
+
+    Subexpressions shared between the components are eliminated before generating
+    code, so that they are only evaluated once per call. The functions for the
+    individual components only evaluate the subexpressions they depend on and are
+    only generated once they are first accessed.
     """
 
     def __init__(self, args, array, **kwargs):
@@ -33,29 +48,187 @@ class NumericalArray(object):
             for the lambda functions that will be generated.
         array : (list, tuple, ~sympy.Matrix, ~sympy.Array)
             The array of symbolic expressions to be lambdified.
+        compile_array : bool
+            Whether or not to generate the function for the whole array right away.
+            When False, it is generated on the first call, so that only accessing
+            components never generates it.
+        backend : str
+            Either ``"python"`` to evaluate the whole array with lambdified Python
+            code, ``"c"`` to evaluate it with compiled native code, see
+            ~riccipy.codegen.CompiledArray, or ``"numba"`` to evaluate it with
+            functions compiled by numba, see ~riccipy.codegen.JittedArray.
+            Components are always lambdified.
         """
-        array = Array(array)
+        array = Array(dense_array(array) if isinstance(array, NDimArray) else array)
         self._vars = args
-        self._objstr = str(array)
         self._array = array
         self._modules = kwargs.pop("modules", None)
-        self._lambda = lambdify(self._vars, self._array, modules=self._modules)
-        self._generator = self._build_generator()
-
-    def _build_generator(self):
-        shape = self._array.shape
-        elements = flatten(self._array)
-        ndarr = np.ndarray((len(elements),), dtype=FunctionType)
-        lfunc = partial(lambdify, modules=self._modules)
-        generator = starmap(lfunc, [(self._vars, elem) for elem in elements])
-        ndarr.put(range(len(elements)), list(generator))
-        return ndarr.reshape(shape)
+        self._backend = kwargs.pop("backend", "python")
+        if self._backend not in _backends:
+            raise ValueError(
+                "backend must be one of {}, got {}".format(_backends, self._backend)
+            )
+        self._printer = _code_printer(self._modules)
+        self._dummies = [Dummy() for _ in args]
+        self._replacements = None
+        self._elements = [
+            sympify(elem).xreplace(dict(zip(args, self._dummies)))
+            for elem in flatten(array)
+        ]
+        self._namespace = None
+        self._lambda = None
+        self._batch = None
+        self._generator = np.full(len(self._elements), None, dtype=object)
+        if kwargs.pop("compile_array", True):
+            if self._backend == "python":
+                self._compile_array()
+            else:
+                self._compile_batch()
+
+    def _eliminate(self):
+        if self._replacements is None:
+            self._replacements, self._elements = cse(
+                self._elements, symbols=numbered_symbols("_x"), order="none"
+            )
+
+    def _source(self, name, results, shape=None, out=False):
+        # source of a function evaluating the results, computing only the
+        # subexpressions they depend on.
+        self._eliminate()
+        needed = set().union(*[expr.free_symbols for expr in results])
+        for sym, value in reversed(self._replacements):
+            if sym in needed:
+                needed |= value.free_symbols
+        doprint = self._printer.doprint
+        params = [doprint(dummy) for dummy in self._dummies] + ["_out"] * out
+        lines = ["def {}({}):".format(name, ", ".join(params))]
+        for sym, value in self._replacements:
+            if sym in needed:
+                lines.append("    {} = {}".format(doprint(sym), doprint(value)))
+        values = [doprint(expr) for expr in results]
+        if out:
+            # the output is zero initialized, so zero components are skipped.
+            for pos, expr in enumerate(results):
+                if expr != 0:
+                    idx = ", ".join(map(str, np.unravel_index(pos, shape)))
+                    lines.append("    _out[..., {}] = {}".format(idx, values[pos]))
+            lines.append("    return _out")
+        else:
+            result = values[0] if shape is None else _nested(iter(values), shape)
+            lines.append("    return {}".format(result))
+        return "\n".join(lines) + "\n"
+
+    def _compile(self, name, results, shape=None, out=False):
+        source = self._source(name, results, shape, out)
+        if self._namespace is None:
+            self._namespace = self._build_namespace()
+        return _execute(source, self._namespace)[name]
+
+    def _compile_array(self):
+        if self._lambda is None:
+            self._eliminate()
+            self._lambda = self._compile("_array", self._elements, self._array.shape)
+        return self._lambda
+
+    def _compile_batch(self):
+        if self._batch is None:
+            self._eliminate()
+            shape = self._array.shape
+            if self._backend == "c":
+                self._batch = CompiledArray(
+                    self._dummies, self._replacements, self._elements, shape
+                )
+            elif self._backend == "numba":
+                self._batch = JittedArray(
+                    self._dummies, self._replacements, self._elements, shape
+                )
+            else:
+                self._batch = self._compile("_batch", self._elements, shape, out=True)
+        return self._batch
+
+    def _component(self, pos):
+        if self._generator[pos] is None:
+            self._eliminate()
+            self._generator[pos] = self._compile("_component", [self._elements[pos]])
+        return self._generator[pos]
+
+    def _build_namespace(self):
+        # lambdify provides the namespace for the printed functions and constants.
+        func = lambdify(
+            self._dummies, S.Zero, modules=self._modules, printer=self._printer
+        )
+        namespace = dict(func.__globals__)
+        exprs = self._elements + [value for _, value in self._replacements]
+        generated = set(sym for sym, _ in self._replacements)
+        for sym in set().union(*[expr.free_symbols for expr in exprs]) - generated:
+            namespace.setdefault(str(sym), sym)
+        return namespace
 
     def __getitem__(self, key):
-        return self._generator.__getitem__(key)
+        positions = np.arange(len(self._elements)).reshape(self._array.shape)[key]
+        if np.ndim(positions) == 0:
+            return self._component(positions)
+        components = np.ndarray(positions.shape, dtype=FunctionType)
+        for idx, pos in np.ndenumerate(positions):
+            components[idx] = self._component(pos)
+        return components
+
+    def batch(self, *args):
+        """
+        Evaluate the array at many points at once.
+
+        The arguments are broadcast against each other and every component is
+        evaluated once for all points, with constant components broadcast to the
+        shape of the arguments.
+
+        Parameters
+        ----------
+        args : (~numpy.ndarray, float)
+            Values of the arguments at each point.
+
+        Returns
+        -------
+        ~numpy.ndarray
+            Array with the broadcast shape of the arguments followed by the shape
+            of the tensor.
+
+        Examples
+        --------
+        >>> import numpy as np
+        >>> from sympy import symbols
+        >>> from riccipy.numerical import NumericalArray
+        >>> x, y = symbols('x y')
+        >>> narr = NumericalArray((x, y), [[x * y, 1], [0, x]])
+        >>> narr.batch(np.arange(3), 2.0).shape
+        (3, 2, 2)
+        >>> narr.batch(np.arange(3), 2.0)[:, 0, :]
+        array([[0., 1.],
+               [2., 1.],
+               [4., 1.]])
+        """
+        if self._backend != "python":
+            return self._compile_batch()(*args)
+        args = [np.asarray(arg) for arg in args]
+        shape = np.broadcast(*args).shape if args else ()
+        dtype = np.result_type(float, *args)
+        out = np.zeros(shape + self._array.shape, dtype=dtype)
+        return self._compile_batch()(*args, out)
+
+    @property
+    def kernel(self):
+        """
+        Jitted function writing the components at a single point into an array.
+
+        Only available with the ``"numba"`` backend, see ~riccipy.codegen.JittedArray.
+        """
+        if self._backend != "numba":
+            raise AttributeError("kernel requires the numba backend")
+        return self._compile_batch().kernel
 
     def __call__(self, *args):
-        return np.asarray(self._lambda(*args))
+        if self._backend != "python" or any(np.ndim(arg) > 0 for arg in args):
+            return self.batch(*args)
+        return np.asarray(self._compile_array()(*args))
 
     def __getattr__(self, attr):
         if hasattr(self._array, attr):
@@ -63,12 +236,72 @@ class NumericalArray(object):
         raise AttributeError("%s has no attribute: %s", self.__class__.__name__, attr)
 
     def __repr__(self):
-        return "NumericalArray(%s)" % self._objstr
+        return "NumericalArray(%s)" % self._array
 
     def __str__(self):
         return self.__repr__()
 
 
+_backends = ("python", "c", "numba")
+
+
+def _code_printer(modules):
+    # the same printer lambdify selects for the given modules.
+    if modules is None:
+        modules = ["numpy"]
+    elif isinstance(modules, (str, dict)) or not hasattr(modules, "__iter__"):
+        modules = [modules]
+    names = [
+        mod if isinstance(mod, str) else getattr(mod, "__name__", None)
+        for mod in modules
+    ]
+    if "mpmath" in names:
+        Printer = MpmathPrinter
+    elif "scipy" in names:
+        Printer = SciPyPrinter
+    elif "numpy" in names:
+        Printer = NumPyPrinter
+    elif "sympy" in names:
+        Printer = SymPyPrinter
+    else:
+        Printer = PythonCodePrinter
+    user_functions = {}
+    for mod in modules[::-1]:
+        if isinstance(mod, dict):
+            user_functions.update({key: key for key in mod})
+    settings = {
+        "fully_qualified_modules": False,
+        "inline": True,
+        "allow_unknown_functions": True,
+        "user_functions": user_functions,
+    }
+    return Printer(settings)
+
+
+def _nested(values, shape):
+    # format an iterator of values as nested lists of the given shape.
+    if not shape:
+        return next(values)
+    rows = [_nested(values, shape[1:]) for _ in range(shape[0])]
+    return "[{}]".format(", ".join(rows))
+
+
+def _execute(source, namespace):
+    global _generated_counter
+    filename = "<numericalarray-{}>".format(_generated_counter)
+    _generated_counter += 1
+    functions = {}
+    exec(compile(source, filename, "exec"), namespace, functions)
+    # register the source so that tracebacks show the generated code.
+    linecache.cache[filename] = (len(source), None, source.splitlines(True), filename)
+    for func in functions.values():
+        func.__name__ = func.__qualname__ = "_lambdifygenerated"
+    return functions
+
+
+_generated_counter = 0
+
+
 def lambdify_tensor(args, expr, idxs=None, **kwargs):
     """
     Generate a numerical array representation for the result of a tensor expression.
@@ -88,6 +321,10 @@ def lambdify_tensor(args, expr, idxs=None, **kwargs):
         this function defaults to ~sympy.lambdify.
     idxs : (list, tuple)
         Iterable of Index objects to specify the indices for the result of ``expr``.
+    backend : str
+        Either ``"python"``, ``"c"`` or ``"numba"`` to evaluate arrays with
+        compiled code.
+        Other keyword arguments are passed to NumericalArray or ~sympy.lambdify.
 
     Examples
     --------
@@ -110,6 +347,6 @@ def lambdify_tensor(args, expr, idxs=None, **kwargs):
     """
     if isinstance(expr, TensExpr):
         expr = expand_array(expr, idxs)
-    if isinstance(expr, Array):
+    if isinstance(expr, NDimArray):
         return NumericalArray(args, expr, **kwargs)
     return lambdify(args, expr, **kwargs)
@@ -0,0 +1,145 @@
+import copyreg
+import io
+import pickle
+import signal
+import time
+from contextlib import contextmanager
+from multiprocessing import Pool
+
+from sympy import Dummy, Symbol
+
+
+def parallel_map(function, items, workers=None):
+    """
+    Apply a function to every item, optionally in a pool of processes.
+
+    The results are returned in the order of the items, so they do not depend
+    on the number of processes. Items and results are exchanged with the
+    processes such that the symbols they contain are the ones of the calling
+    process, with the same assumptions.
+
+    Parameters
+    ----------
+    function : callable
+        Picklable function to apply. Each process receives its own copy, so
+        any state the function accumulates is local to the process.
+    items : list
+        Picklable arguments to apply the function to.
+    workers : int
+        Number of processes to use. By default, the function is applied in the
+        current process.
+    """
+    if not workers or workers <= 1 or len(items) <= 1:
+        return [function(item) for item in items]
+    chunksize = max(1, len(items) // (4 * workers))
+    with Pool(workers, _init_worker, (function,)) as pool:
+        results = pool.map(_call_worker, [_dumps(item) for item in items], chunksize)
+    return [pickle.loads(result) for result in results]
+
+
+class TimeoutExpired(Exception):
+    """
+    Raised when a computation exceeds the time limit set by ``time_limit``.
+    """
+
+
+class _EnclosingExpired(Exception):
+    # raised out of a nested time limit once an enclosing one has run out, so
+    # that it is not mistaken for the nested limit expiring by code handling
+    # TimeoutExpired in between.
+    pass
+
+
+@contextmanager
+def time_limit(seconds):
+    """
+    Raise TimeoutExpired in the body of the statement after a number of seconds.
+
+    The limit relies on ``SIGALRM`` and is only enforced on platforms that
+    provide it and in the main thread of a process; elsewhere, or when
+    ``seconds`` is None, the body runs without a limit.
+
+    Limits may be nested. An inner limit never extends an enclosing one, and
+    once the inner body exits the enclosing limit resumes with the time it has
+    left, expiring right away if it ran out in the inner body.
+    """
+    if seconds is None or not hasattr(signal, "SIGALRM"):
+        yield
+        return
+
+    def expire(signum, frame):
+        raise TimeoutExpired()
+
+    expire.is_time_limit = True
+    try:
+        previous = signal.signal(signal.SIGALRM, expire)
+    except ValueError:
+        # signals can only be handled in the main thread.
+        yield
+        return
+    outer = signal.getitimer(signal.ITIMER_REAL)[0]
+    start = time.monotonic()
+    signal.setitimer(signal.ITIMER_REAL, min(seconds, outer) if outer else seconds)
+    expired = False
+    try:
+        yield
+    except (TimeoutExpired, _EnclosingExpired):
+        expired = True
+    finally:
+        signal.setitimer(signal.ITIMER_REAL, 0)
+        signal.signal(signal.SIGALRM, previous)
+    if outer:
+        remaining = outer - (time.monotonic() - start)
+        if remaining <= 0 and getattr(previous, "is_time_limit", False):
+            raise _EnclosingExpired()
+        # timers other than time limits are delivered as usual.
+        signal.setitimer(signal.ITIMER_REAL, max(remaining, 1e-6))
+    if expired:
+        raise TimeoutExpired()
+
+
+_worker_function = None
+
+
+def _init_worker(function):
+    global _worker_function
+    _worker_function = function
+
+
+def _call_worker(item):
+    return _dumps(_worker_function(pickle.loads(item)))
+
+
+def _dumps(obj):
+    # pickle an object, storing symbols by the arguments of their constructors.
+    # sympy pickles symbols by their name alone and sets their assumptions once
+    # created, so that unpickling would return an existing symbol of the same
+    # name and overwrite its assumptions, leaving its hash stale.
+    stream = io.BytesIO()
+    pickler = pickle.Pickler(stream, pickle.HIGHEST_PROTOCOL)
+    pickler.dispatch_table = _Reducers(copyreg.dispatch_table)
+    pickler.dump(obj)
+    return stream.getvalue()
+
+
+class _Reducers(dict):
+    # reductions by type, extended to every subclass of Symbol.
+
+    def __missing__(self, cls):
+        if issubclass(cls, Symbol):
+            return _reduce_symbol
+        raise KeyError(cls)
+
+
+def _reduce_symbol(symbol):
+    assumptions = getattr(symbol._assumptions, "_generator", None)
+    if assumptions is None:
+        assumptions = symbol.assumptions0
+    kwargs = dict(assumptions)
+    if isinstance(symbol, Dummy):
+        kwargs["dummy_index"] = symbol.dummy_index
+    return _rebuild_symbol, (type(symbol), symbol.__getnewargs__(), kwargs)
+
+
+def _rebuild_symbol(cls, args, kwargs):
+    return cls(*args, **kwargs)
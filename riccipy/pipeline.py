@@ -0,0 +1,276 @@
+import json
+import multiprocessing
+import os
+import time
+from contextlib import contextmanager
+from importlib import import_module
+from multiprocessing.connection import wait
+
+from sympy.tensor.array import NDimArray
+
+from .metric import Metric
+from .parallel import TimeoutExpired, time_limit
+from .sparse import nonzero_components
+from .tensor import AbstractTensor
+
+try:
+    import resource
+except ImportError:  # pragma: no cover
+    resource = None
+
+# time given to a worker past its time limit before it is terminated.
+_GRACE = 5.0
+
+
+def sweep(
+    entries=None,
+    properties=("ricci_tensor",),
+    workers=None,
+    timeout=None,
+    memory_limit=None,
+    method="components",
+    simplification=None,
+):
+    """
+    Compute curvature properties for entries of the metric catalog, yielding a
+    record for each entry as soon as it completes.
+
+    Every entry is computed in a process of its own, so that memory is returned
+    to the system after each entry and an entry that runs out of time or memory,
+    or crashes its process, only produces a failed record. Records are yielded
+    in the order in which the entries complete and are not retained. Closing the
+    generator, as happens when a loop over it is left early, terminates the
+    entries still running.
+
+    Records are dictionaries with the ``module``, ``name``, ``coordinates`` and
+    ``notes`` of the entry, a ``status`` that is one of ``"ok"``, ``"timeout"``,
+    ``"memory"`` and ``"error"``, the elapsed ``time`` in seconds, the
+    ``properties`` computed before the entry finished or failed and, for
+    failures, an ``error`` message. Scalars are stored as strings and arrays
+    by their ``shape`` and nonzero ``components``.
+
+    Parameters
+    ----------
+    entries : (~riccipy.metrics.Query, iterable)
+        Query selecting the entries, or names of metrics and entries of
+        ``riccipy.metrics.metric_data``. Defaults to the whole catalog.
+    properties : iterable
+        Names of the properties of ~riccipy.metric.Metric to compute, such as
+        ``"riemann"`` or ``"kretschmann"``.
+    workers : int
+        Number of entries to compute at once. Defaults to the number of CPUs.
+    timeout : float
+        Time limit in seconds for each entry.
+    memory_limit : int
+        Limit on the address space of each process in bytes. Only enforced on
+        platforms providing the ``resource`` module.
+    method : str
+        Engine used for computing the Christoffel symbols, see
+        ~riccipy.metric.Metric.
+    simplification : ~riccipy.simplification.SimplificationPolicy
+        Simplifications applied to the curvature properties, see
+        ~riccipy.metric.Metric.
+
+    Examples
+    --------
+    >>> from riccipy.metrics import Query
+    >>> from riccipy.pipeline import sweep
+    >>> for record in sorted(sweep(Query('minkowski'), ['ricci_scalar'], workers=2),
+    ...                      key=lambda record: record['module']):
+    ...     print(record['module'], record['status'], record['properties'])
+    minkowski_1 ok {'ricci_scalar': '0'}
+    minkowski_2 ok {'ricci_scalar': '0'}
+    minkowski_3 ok {'ricci_scalar': '0'}
+    """
+    properties = tuple(properties)
+    allowed = Metric._curvature + Metric._invariants
+    for name in properties:
+        if name not in allowed:
+            raise ValueError(
+                "properties must be among {}, received {}".format(allowed, name)
+            )
+    tasks = _tasks(entries)
+    workers = workers or os.cpu_count()
+    options = (properties, method, simplification, timeout, memory_limit)
+    deadline = None if timeout is None else timeout + _GRACE
+    running = {}
+    try:
+        while tasks or running:
+            while tasks and len(running) < workers:
+                entry = tasks.pop(0)
+                receiver, process = _start(entry.module, options)
+                running[receiver] = (entry, process, time.monotonic())
+            # wake up no later than the first running entry runs out of time.
+            delay = None
+            if deadline is not None:
+                first = min(start for _, _, start in running.values())
+                delay = max(0.0, first + deadline - time.monotonic())
+            for receiver in wait(list(running), delay):
+                entry, process, start = running.pop(receiver)
+                yield _record(entry, _receive(receiver, process), start)
+            for receiver, (entry, process, start) in list(running.items()):
+                if deadline is not None and time.monotonic() - start >= deadline:
+                    del running[receiver]
+                    yield _record(entry, _terminate(receiver, process, start), start)
+    finally:
+        # entries still running when the sweep is abandoned are not waited for.
+        for receiver, (entry, process, start) in running.items():
+            _terminate(receiver, process, start)
+
+
+def write_json_lines(records, path):
+    """
+    Write records to a file as they arrive, one JSON document per line.
+
+    Each line is flushed once written, so that the file holds every completed
+    record even if the sweep producing them is interrupted.
+
+    Parameters
+    ----------
+    records : iterable
+        Records to write, such as those yielded by ``sweep``.
+    path : str
+        Path of the file to append the records to.
+
+    Returns
+    -------
+    int
+        Number of records written.
+    """
+    count = 0
+    with open(path, "a") as stream:
+        for record in records:
+            stream.write(json.dumps(record) + "\n")
+            stream.flush()
+            count += 1
+    return count
+
+
+def _tasks(entries):
+    from .metrics import Query, _select, metric_data
+
+    if entries is None:
+        selected = list(metric_data)
+    elif isinstance(entries, Query):
+        selected = entries.entries()
+    else:
+        selected = []
+        for item in entries:
+            if isinstance(item, str):
+                selected.extend(_select(item))
+            else:
+                selected.append(item)
+    # entries may be selected more than once, but are only computed once.
+    modules = set()
+    tasks = []
+    for entry in selected:
+        if entry.module not in modules:
+            modules.add(entry.module)
+            tasks.append(entry)
+    return tasks
+
+
+def _start(module, options):
+    receiver, sender = multiprocessing.Pipe(duplex=False)
+    process = multiprocessing.Process(
+        target=_run, args=(module, options, sender), daemon=True
+    )
+    process.start()
+    sender.close()
+    return receiver, process
+
+
+def _receive(receiver, process):
+    try:
+        result = receiver.recv()
+    except EOFError:
+        # the process died without reporting, for example when it was killed.
+        process.join()
+        result = _failure(
+            "error", "process exited with code {}".format(process.exitcode)
+        )
+    receiver.close()
+    process.join()
+    return result
+
+
+def _terminate(receiver, process, start):
+    process.terminate()
+    process.join()
+    receiver.close()
+    elapsed = time.monotonic() - start
+    return _failure("timeout", "terminated after {:.1f} seconds".format(elapsed))
+
+
+def _run(module, options, connection):
+    properties, method, simplification, timeout, memory_limit = options
+    record = {"status": "ok", "properties": {}}
+    try:
+        with _memory_limit(memory_limit), time_limit(timeout):
+            spacetime = import_module("riccipy.metrics." + module)
+            g = Metric(
+                "g",
+                spacetime.coords,
+                spacetime.metric,
+                method=method,
+                simplification=simplification,
+            )
+            for name in properties:
+                record["properties"][name] = _serialize(getattr(g, name))
+    except TimeoutExpired:
+        record.update(_failure("timeout", "exceeded {} seconds".format(timeout)))
+    except MemoryError:
+        record.update(_failure("memory", "exceeded {} bytes".format(memory_limit)))
+    except Exception as error:
+        record.update(_failure("error", "{}: {}".format(type(error).__name__, error)))
+    connection.send(record)
+    connection.close()
+
+
+@contextmanager
+def _memory_limit(limit):
+    # only the soft limit is lowered, so that it can be lifted again to report
+    # the result.
+    if limit is None or resource is None:
+        yield
+        return
+    soft, hard = resource.getrlimit(resource.RLIMIT_AS)
+    if hard != resource.RLIM_INFINITY:
+        limit = min(limit, hard)
+    resource.setrlimit(resource.RLIMIT_AS, (limit, hard))
+    try:
+        yield
+    finally:
+        resource.setrlimit(resource.RLIMIT_AS, (soft, hard))
+
+
+def _serialize(value):
+    if isinstance(value, AbstractTensor):
+        value = value.as_array()
+    if isinstance(value, NDimArray):
+        return {
+            "shape": [int(dim) for dim in value.shape],
+            "components": {
+                ",".join(map(str, idx)): str(component)
+                for idx, component in nonzero_components(value).items()
+            },
+        }
+    return str(value)
+
+
+def _failure(status, error):
+    return {"status": status, "error": error}
+
+
+def _record(entry, result, start):
+    record = {
+        "module": entry.module,
+        "name": entry.get("name"),
+        "coordinates": entry.get("coordinates"),
+        "notes": entry.get("notes"),
+        "status": "ok",
+        "time": round(time.monotonic() - start, 3),
+        "properties": {},
+    }
+    record.update(result)
+    return record
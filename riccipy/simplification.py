@@ -0,0 +1,120 @@
+from collections import OrderedDict
+
+from sympy import cancel, expand, together, trigsimp
+from sympy.tensor.array import NDimArray
+
+from .parallel import TimeoutExpired, parallel_map, time_limit
+from .sparse import build_array, is_sparse, nonzero_components
+
+_steps = OrderedDict(
+    [
+        ("cancel", cancel),
+        ("together", together),
+        ("trigsimp", trigsimp),
+        ("expand", expand),
+    ]
+)
+
+
+class SimplificationPolicy(object):
+    """
+    Class describing the simplifications applied to intermediate curvature results.
+
+    Each component of a curvature property is passed through the steps in turn as
+    soon as the property is computed, so that the properties computed from it
+    start from simplified expressions. When a component exceeds the time budget,
+    the result of the last completed step is kept.
+
+    Examples
+    --------
+    >>> from sympy import diag, sin, symbols
+    >>> from riccipy import Metric
+    >>> from riccipy.simplification import SimplificationPolicy
+    >>> th, ph = symbols('theta phi', real=True)
+    >>> policy = SimplificationPolicy(('cancel', 'trigsimp'), timeout=10)
+    >>> g = Metric('g', (th, ph), diag(1, sin(th) ** 2), simplification=policy)
+    >>> g.christoffel[0, 1, 1]
+    -sin(2*theta)/2
+    """
+
+    def __init__(self, steps=("cancel",), timeout=None, properties=None):
+        """
+        Create a new SimplificationPolicy.
+
+        Parameters
+        ----------
+        steps : iterable
+            Simplifications to apply in order, each either one of ``"cancel"``,
+            ``"together"``, ``"trigsimp"`` and ``"expand"`` or a picklable
+            function of a single expression.
+        timeout : float
+            Time limit in seconds for simplifying a single component. Only
+            enforced on platforms supporting ``SIGALRM``.
+        properties : iterable
+            Names of the curvature properties to simplify, such as
+            ``"christoffel"``. Defaults to all of them.
+        """
+        steps = tuple(steps)
+        for step in steps:
+            if not callable(step) and step not in _steps:
+                raise ValueError(
+                    "steps must be callable or among {}, received {}".format(
+                        tuple(_steps), step
+                    )
+                )
+        self.steps = steps
+        self.timeout = timeout
+        self.properties = None if properties is None else frozenset(properties)
+
+    def __repr__(self):
+        return "SimplificationPolicy(steps={}, timeout={}, properties={})".format(
+            self.steps,
+            self.timeout,
+            None if self.properties is None else sorted(self.properties),
+        )
+
+    def __call__(self, expr):
+        """
+        Return an expression simplified by the steps within the time budget.
+        """
+        result = expr
+        try:
+            with time_limit(self.timeout):
+                for step in self.steps:
+                    result = _steps.get(step, step)(result)
+        except TimeoutExpired:
+            pass
+        return result
+
+    def applies_to(self, name):
+        """
+        Return whether or not the curvature property ``name`` is simplified.
+        """
+        return self.properties is None or name in self.properties
+
+    def apply(self, name, value, workers=None):
+        """
+        Return a curvature property simplified according to the policy.
+
+        Zero components are skipped and each distinct component is only
+        simplified once.
+
+        Parameters
+        ----------
+        name : str
+            Name of the curvature property.
+        value : (~sympy.Array, ~sympy.Expr)
+            Components of the property, or the property itself if it is a scalar.
+        workers : int
+            Number of processes to simplify the components in. By default, they
+            are simplified in the current process.
+        """
+        if not self.steps or not self.applies_to(name):
+            return value
+        if not isinstance(value, NDimArray):
+            return self(value)
+        components = nonzero_components(value)
+        distinct = list(OrderedDict.fromkeys(components.values()))
+        simplified = dict(zip(distinct, parallel_map(self, distinct, workers)))
+        components = {idx: simplified[expr] for idx, expr in components.items()}
+        return build_array(components, value.shape, is_sparse(value))
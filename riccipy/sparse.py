@@ -0,0 +1,263 @@
+from collections import defaultdict
+from itertools import product
+
+from sympy import (
+    Array,
+    ImmutableSparseNDimArray,
+    Matrix,
+    Mul,
+    MutableDenseNDimArray,
+    S,
+    factor,
+)
+from sympy.tensor.array import SparseNDimArray
+
+
+def is_sparse(array):
+    """
+    Return whether or not an array stores only its nonzero components.
+    """
+    return isinstance(array, SparseNDimArray)
+
+
+def nonzero_components(array):
+    """
+    Return the nonzero components of an array.
+
+    Parameters
+    ----------
+    array : ~sympy.tensor.array.NDimArray
+        Either a dense or a sparse array.
+
+    Returns
+    -------
+    dict
+        Mapping of index tuples to the nonzero components stored at them.
+
+    Examples
+    --------
+    >>> from sympy import diag, symbols, ImmutableSparseNDimArray
+    >>> from riccipy.sparse import nonzero_components
+    >>> x, y = symbols('x y')
+    >>> nonzero_components(ImmutableSparseNDimArray(diag(x, 0, y)))
+    {(0, 0): x, (2, 2): y}
+    """
+    if is_sparse(array):
+        return {
+            array._get_tuple_index(pos): value
+            for pos, value in array._sparse_array.items()
+            if value != 0
+        }
+    if array.rank() == 0:
+        value = array[()]
+        return {(): value} if value != 0 else {}
+    components = {}
+    for idx in product(*map(range, array.shape)):
+        value = array[idx]
+        if value != 0:
+            components[idx] = value
+    return components
+
+
+def sparse_array(components, shape):
+    """
+    Create an immutable sparse array from a mapping of index tuples to components.
+
+    Parameters
+    ----------
+    components : dict
+        Mapping of index tuples to components. Zero components are dropped.
+    shape : tuple
+        Shape of the resulting array.
+    """
+    strides = _strides(shape)
+    flat = {
+        sum(i * s for i, s in zip(idx, strides)): value
+        for idx, value in components.items()
+        if value != 0
+    }
+    return ImmutableSparseNDimArray(flat, shape)
+
+
+def build_array(components, shape, sparse=False):
+    """
+    Create an immutable array, either dense or sparse, from a mapping of index
+    tuples to components.
+    """
+    if sparse:
+        return sparse_array(components, shape)
+    array = MutableDenseNDimArray.zeros(*shape)
+    for idx, value in components.items():
+        array[idx] = value
+    return Array(array)
+
+
+def dense_array(array):
+    """
+    Convert an array to an immutable dense array, leaving dense arrays as is.
+    """
+    if not is_sparse(array):
+        return array
+    return build_array(nonzero_components(array), array.shape)
+
+
+def contract_axis(components, matrix, pos):
+    """
+    Contract one axis of an array with the second axis of a matrix.
+
+    The result has the same index layout as the input with the index at
+    ``pos`` replaced by the first index of ``matrix``. Only pairs of nonzero
+    components are multiplied.
+
+    Parameters
+    ----------
+    components : dict
+        Nonzero components of the array, keyed by index tuples.
+    matrix : dict
+        Nonzero components of the matrix, keyed by index tuples.
+    pos : int
+        Position of the axis to contract.
+    """
+    if all(i == j for i, j in matrix):
+        # a diagonal matrix only rescales each component.
+        return {
+            idx: matrix[idx[pos], idx[pos]] * value
+            for idx, value in components.items()
+            if (idx[pos], idx[pos]) in matrix
+        }
+    rows = defaultdict(list)
+    for (i, j), value in matrix.items():
+        rows[j].append((i, value))
+    result = defaultdict(lambda: S.Zero)
+    for idx, value in components.items():
+        for i, coeff in rows.get(idx[pos], ()):
+            result[_replace(idx, pos, i)] += coeff * value
+    return {idx: value for idx, value in result.items() if value != 0}
+
+
+def inverse_components(components, dim):
+    """
+    Invert a square matrix from its nonzero components.
+
+    The rows and columns are split into the connected components of the graph
+    joining ``i`` and ``j`` whenever ``(i, j)`` is nonzero, so that a matrix
+    that is block diagonal up to a permutation is inverted block by block.
+    Diagonal entries are inverted directly and larger blocks as their adjugate
+    over their factored determinant.
+
+    Parameters
+    ----------
+    components : dict
+        Nonzero components of the matrix, keyed by index tuples.
+    dim : int
+        Number of rows of the matrix.
+
+    Returns
+    -------
+    dict
+        Nonzero components of the inverse, keyed by index tuples.
+
+    Examples
+    --------
+    >>> from sympy import symbols
+    >>> from riccipy.sparse import inverse_components
+    >>> a, b, c = symbols('a b c')
+    >>> inverse_components({(0, 0): a, (0, 2): b, (2, 0): b, (1, 1): c}, 3)
+    {(0, 2): 1/b, (2, 0): 1/b, (2, 2): -a/b**2, (1, 1): 1/c}
+    """
+    inverse = {}
+    for block in _blocks(components, dim):
+        if len(block) == 1:
+            (i,) = block
+            if (i, i) not in components:
+                raise ValueError("matrix is not invertible")
+            inverse[i, i] = 1 / components[i, i]
+            continue
+        matrix = _block_matrix(components, block)
+        det = factor(matrix.det())
+        if det == 0:
+            raise ValueError("matrix is not invertible")
+        adjugate = matrix.adjugate()
+        for i, j in product(range(len(block)), repeat=2):
+            if adjugate[i, j] != 0:
+                inverse[block[i], block[j]] = adjugate[i, j] / det
+    return inverse
+
+
+def determinant_components(components, dim):
+    """
+    Compute the determinant of a square matrix from its nonzero components.
+
+    The determinant is the product of the determinants of the blocks found by
+    :func:`inverse_components`, each of which is factored.
+
+    Parameters
+    ----------
+    components : dict
+        Nonzero components of the matrix, keyed by index tuples.
+    dim : int
+        Number of rows of the matrix.
+
+    Examples
+    --------
+    >>> from sympy import symbols
+    >>> from riccipy.sparse import determinant_components
+    >>> a, b, c = symbols('a b c')
+    >>> determinant_components({(0, 0): a, (0, 2): b, (2, 0): b, (1, 1): c}, 3)
+    -b**2*c
+    """
+    factors = []
+    for block in _blocks(components, dim):
+        if len(block) == 1:
+            (i,) = block
+            factors.append(components.get((i, i), S.Zero))
+        else:
+            factors.append(factor(_block_matrix(components, block).det()))
+    return Mul(*factors)
+
+
+def _block_matrix(components, block):
+    return Matrix(
+        len(block),
+        len(block),
+        lambda i, j: components.get((block[i], block[j]), S.Zero),
+    )
+
+
+def _blocks(components, dim):
+    # connected components of the rows linked by nonzero entries.
+    links = defaultdict(set)
+    for i, j in components:
+        links[i].add(j)
+        links[j].add(i)
+    seen = set()
+    blocks = []
+    for start in range(dim):
+        if start in seen:
+            continue
+        block = []
+        stack = [start]
+        seen.add(start)
+        while stack:
+            i = stack.pop()
+            block.append(i)
+            for j in links[i] - seen:
+                seen.add(j)
+                stack.append(j)
+        blocks.append(sorted(block))
+    return blocks
+
+
+def _replace(idx, pos, value):
+    idx = list(idx)
+    idx[pos] = value
+    return tuple(idx)
+
+
+def _strides(shape):
+    strides = []
+    step = 1
+    for dim in reversed(shape):
+        strides.insert(0, step)
+        step *= dim
+    return strides
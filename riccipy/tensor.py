@@ -1,9 +1,21 @@
-from collections import defaultdict
-
-from sympy import Array, preorder_traversal, simplify, symbols
+from collections import OrderedDict, defaultdict, namedtuple
+
+from sympy import (
+    Add,
+    Array,
+    ImmutableSparseNDimArray,
+    S,
+    cancel,
+    preorder_traversal,
+    simplify,
+    symbols,
+)
+from sympy.combinatorics import PermutationGroup
 from sympy.core.decorators import call_highest_priority
-from sympy.tensor.array import permutedims, tensorcontraction, tensorproduct
+from sympy.tensor.array import NDimArray
 from sympy.tensor.tensor import (
+    TensAdd,
+    TensExpr,
     TensMul,
     Tensor as SympyTensor,
     TensorHead,
@@ -12,6 +24,20 @@ from sympy.tensor.tensor import (
     TensorSymmetry,
 )
 
+from .parallel import TimeoutExpired, parallel_map, time_limit
+from .sparse import (
+    build_array,
+    contract_axis,
+    dense_array,
+    inverse_components,
+    is_sparse,
+    nonzero_components,
+    sparse_array,
+)
+
+
+CacheInfo = namedtuple("CacheInfo", ["hits", "misses", "maxsize", "currsize"])
+
 
 class Repl(dict):
     """
@@ -73,17 +99,41 @@ class AbstractTensor(object):
     def as_array(self):
         """
         Return the data stored in the tensor as an instance of sympy.Array.
+
+        Sparse tensors return an instance of ~sympy.ImmutableSparseNDimArray.
         """
         return self._array.copy()
 
     def as_inverse(self):
         """
         Return the data of the inversed array associated with the tensor.
+
+        Blocks of the matrix that are not coupled by nonzero components are
+        inverted separately, see :func:`riccipy.sparse.inverse_components`.
         """
         if self._inverse is None:
-            self._inverse = Array(self.as_matrix().inv())
+            shape = self._array.shape
+            if len(shape) != 2 or shape[0] != shape[1]:
+                raise ValueError(
+                    "only square matrices can be inverted, received array of shape {}".format(
+                        shape
+                    )
+                )
+            inverse = inverse_components(self.as_components(), shape[0])
+            self._inverse = build_array(inverse, shape, self.is_sparse)
         return self._inverse
 
+    def as_components(self):
+        """
+        Return the nonzero components of the tensor as a dictionary keyed by
+        index tuples.
+        """
+        return nonzero_components(self._array)
+
+    @property
+    def is_sparse(self):
+        return is_sparse(self._array)
+
 
 class IndexedTensor(AbstractTensor, SympyTensor):
     """
@@ -144,9 +194,20 @@ class Tensor(AbstractTensor, TensorHead):
         ``(2, -2)``     tensor with the first 2 indices commuting and the last 2 anticommuting
         ``(1, 1, 1)``   tensor with 3 indices without any symmetry
 
+        A ~sympy.tensor.tensor.TensorSymmetry may also be passed directly, for
+        example ``TensorSymmetry.riemann()``.
+
+        If the parameter ``sparse`` is true, or ``matrix`` is already a sparse
+        array, only the nonzero components of the tensor are stored.
+
         Additionally, the parameter ``covar`` indicates that the passed array
         corresponds to the covariance of the tensor it is intended to describe.
 
+        The arrays for each combination of raised and lowered indices are cached
+        once computed, and recomputed once the metric raising and lowering them
+        changes. The parameter ``cache_size`` bounds the number of such
+        arrays kept, discarding the least recently used first.
+
         Lastly, the parameter ``comm`` is used to indicate what commutation
         group the tensor belongs to. In other words, it describes what other
         types of tensors the one being created is allowed to commute with.
@@ -170,10 +231,15 @@ class Tensor(AbstractTensor, TensorHead):
         >>> expand_array(expr)
         2*B1**2 + 2*B2**2 + 2*B3**2 - 2*E1**2 - 2*E2**2 - 2*E3**2
         """
-        array = Array(matrix)
+        if kwargs.pop("sparse", False) or is_sparse(matrix):
+            array = ImmutableSparseNDimArray(matrix)
+        else:
+            array = Array(matrix)
         sym = kwargs.pop("symmetry", array.rank() * (1,))
-        sym = TensorSymmetry.direct_product(*sym)
+        if not isinstance(sym, TensorSymmetry):
+            sym = TensorSymmetry.direct_product(*sym)
         comm = kwargs.pop("comm", "general")
+        cache_size = kwargs.pop("cache_size", None)
         covar = tuple(kwargs.pop("covar", array.rank() * (1,)))
         if len(covar) != array.rank():
             raise ValueError(
@@ -189,6 +255,10 @@ class Tensor(AbstractTensor, TensorHead):
         # resolves a bug with pretty printing.
         obj.__class__.__name__ = "TensorHead"
         obj.covar = covar
+        obj._variants = OrderedDict()
+        obj._variants_size = cache_size
+        obj._variants_hits = 0
+        obj._variants_misses = 0
         idxs = obj._dummy_idxs()
         obj._repl[obj(*idxs)] = array
         return obj
@@ -245,6 +315,8 @@ class Tensor(AbstractTensor, TensorHead):
         [[1 - 1/r, 0, 0, 0], [0, 1/(1 - 1/r), 0, 0], [0, 0, r**2, 0], [0, 0, 0, r**2*sin(theta)**2]]
         """
         self._array = self._array.subs(sub_dict)
+        self._inverse = None
+        self.cache_clear()
         idxs = self._dummy_idxs()
         self._repl[self(*idxs)] = self._array
 
@@ -258,6 +330,12 @@ class Tensor(AbstractTensor, TensorHead):
         indices : TensorIndex
             Defines the covariance and contravariance of the returned array.
 
+        Notes
+        -----
+        Each index is raised or lowered by applying the metric along its axis,
+        multiplying only nonzero components. For diagonal metrics this reduces
+        to scaling each component.
+
         Examples
         --------
         >>> from sympy import Function, diag, exp, sin, symbols
@@ -270,28 +348,156 @@ class Tensor(AbstractTensor, TensorHead):
         >>> g.covariance_transform(mu, nu)
         [[-exp(-2*alpha(r)), 0, 0, 0], [0, exp(-2*beta(r)), 0, 0], [0, 0, r**(-2), 0], [0, 0, 0, 1/(r**2*sin(theta)**2)]]
         """  # noqa: E501
-        array = self.as_array()
-        for pos, idx in enumerate(indices):
-            if idx.is_up ^ (self.covar[pos] > 0):
-                if idx.is_up:
-                    metric = idx.tensor_index_type.metric.as_inverse()
-                else:
-                    metric = idx.tensor_index_type.metric.as_array()
-                new = tensorcontraction(tensorproduct(metric, array), (1, 2 + pos))
-                permu = list(range(len(indices)))
-                permu[0], permu[pos] = permu[pos], permu[0]
-                array = permutedims(new, permu)
+        # the arrays depend on the metrics of the indices as they are now.
+        key = tuple((idx.is_up, idx.tensor_index_type._generation) for idx in indices)
+        if key in self._variants:
+            self._variants_hits += 1
+            self._variants.move_to_end(key)
+            return self._variants[key]
+        self._variants_misses += 1
+        array = self._covariance_transform(*indices)
+        self._variants[key] = array
+        if self._variants_size is not None:
+            while len(self._variants) > self._variants_size:
+                self._variants.popitem(last=False)
         return array
 
-    def simplify(self):
+    def _covariance_transform(self, *indices):
+        flips = [
+            pos for pos, idx in enumerate(indices) if idx.is_up ^ (self.covar[pos] > 0)
+        ]
+        if not flips:
+            return self.as_array()
+        components = self.as_components()
+        for pos in flips:
+            idx = indices[pos]
+            components = contract_axis(
+                components, _metric_components(idx, idx.is_up), pos
+            )
+        return build_array(components, self._array.shape, self.is_sparse)
+
+    def cache_info(self):
+        """
+        Return statistics on the cache of arrays with raised and lowered indices.
+
+        Returns
+        -------
+        CacheInfo
+            Named tuple of ``hits``, ``misses``, ``maxsize`` and ``currsize``
+            in the manner of ``functools.lru_cache``.
+        """
+        return CacheInfo(
+            self._variants_hits,
+            self._variants_misses,
+            self._variants_size,
+            len(self._variants),
+        )
+
+    def cache_clear(self):
+        """
+        Discard the cached arrays with raised and lowered indices.
+        """
+        self._variants.clear()
+        self._variants_hits = 0
+        self._variants_misses = 0
+
+    def simplify(self, workers=None, timeout=None, fallback=cancel):
         """
         Replace the stored array associated with this tensor with a simplified
         version. This method also replaces the entry in the replacement dictionary.
+
+        Zero components are skipped and each distinct component is only
+        simplified once.
+
+        Parameters
+        ----------
+        workers : int
+            Number of processes to simplify the components in. By default, they
+            are simplified in the current process.
+        timeout : float
+            Time limit in seconds for simplifying a single component. Components
+            exceeding it are simplified with ``fallback`` instead. Only enforced
+            on platforms supporting ``SIGALRM``.
+        fallback : callable
+            Cheaper simplification function used for components exceeding
+            ``timeout``.
         """
-        array = self.as_array().applyfunc(simplify)
+        components = self.as_components()
+        # components related by the symmetry of the tensor share a canonical one.
+        canonical = {}
+        for idx in components:
+            canon, sign = self._canonical_index(idx)
+            if canon not in components:
+                canon, sign = idx, 1
+            canonical[idx] = (canon, sign)
+        # distinct expressions up to sign among the canonical components.
+        distinct = OrderedDict()
+        for idx, (canon, _) in canonical.items():
+            value = components[canon]
+            if value not in distinct and -value not in distinct:
+                distinct[value] = None
+        distinct = list(distinct)
+        simplifier = _Simplifier(timeout, fallback)
+        simplified = dict(zip(distinct, parallel_map(simplifier, distinct, workers)))
+
+        def lookup(value):
+            if value in simplified:
+                return simplified[value]
+            return -simplified[-value]
+
+        components = {
+            idx: sign * lookup(components[canon])
+            for idx, (canon, sign) in canonical.items()
+        }
+        array = build_array(components, self._array.shape, self.is_sparse)
+        self._set_array(array)
+        return array
+
+    def _set_array(self, array):
+        # replace the stored array along with everything derived from it.
         self._array = array
+        self._inverse = None
+        self.cache_clear()
         self._repl.setitem(self, array)
-        return array
+        for metric in set(self.index_types):
+            if metric.metric is self:
+                metric._generation += 1
+
+    def _canonical_index(self, idx):
+        # the smallest index related to idx by a permutation of slots in the
+        # symmetry group that maps raised to raised and lowered to lowered
+        # slots, with the sign relating their components.
+        return min(
+            (tuple(idx[pos] for pos in perm), sign)
+            for perm, sign in self._slot_symmetries()
+        )
+
+    def _slot_symmetries(self):
+        if getattr(self, "_symmetries", None) is None:
+            rank = len(self.covar)
+            symmetries = []
+            for perm in PermutationGroup(self.symmetry.generators).generate():
+                form = perm.array_form
+                slots = form[:rank]
+                if all(self.covar[pos] == self.covar[i] for i, pos in enumerate(slots)):
+                    symmetries.append((tuple(slots), -1 if form[rank] != rank else 1))
+            self._symmetries = symmetries
+        return self._symmetries
+
+
+class _Simplifier(object):
+    # simplify an expression, falling back to a cheaper function on timeout.
+
+    def __init__(self, timeout, fallback):
+        self.timeout = timeout
+        self.fallback = fallback
+
+    def __call__(self, expr):
+        try:
+            with time_limit(self.timeout):
+                return simplify(expr)
+        except TimeoutExpired:
+            return self.fallback(expr)
 
 
 class Index(TensorIndex):
@@ -306,7 +512,96 @@ class Index(TensorIndex):
         return Index(self.name, self.tensor_index_type, (not self.is_up))
 
 
-def expand_array(expr, idxs=None):
+def _metric_components(idx, inverse):
+    metric = idx.tensor_index_type.metric
+    matrix = metric.as_inverse() if inverse else metric.as_array()
+    return nonzero_components(matrix)
+
+
+def _sum_repeated(idxs, components):
+    # contract the positions of indices that appear twice.
+    pairs = [
+        (p1, p2)
+        for p1, idx1 in enumerate(idxs)
+        for p2, idx2 in enumerate(idxs)
+        if p1 < p2 and idx1.name == idx2.name
+    ]
+    summed = {pos for pair in pairs for pos in pair}
+    free = [pos for pos in range(len(idxs)) if pos not in summed]
+    terms = defaultdict(list)
+    for key, value in components.items():
+        if all(key[p1] == key[p2] for p1, p2 in pairs):
+            terms[tuple(key[pos] for pos in free)].append(value)
+    result = {key: Add(*values) for key, values in terms.items()}
+    return [idxs[pos] for pos in free], result
+
+
+def _permute_components(components, source, target):
+    # reorder the keys of the components from the indices in ``source`` to the
+    # indices in ``target``, raising or lowering where their variance differs.
+    order = []
+    for idx in target:
+        matches = [pos for pos, other in enumerate(source) if other.name == idx.name]
+        if not matches:
+            raise ValueError("incompatible indices: %s and %s" % (source, target))
+        pos = matches[0]
+        if source[pos].is_up ^ idx.is_up:
+            matrix = _metric_components(idx, idx.is_up)
+            components = contract_axis(components, matrix, pos)
+        order.append(pos)
+    return {tuple(key[pos] for pos in order): v for key, v in components.items()}
+
+
+def _multiply_components(idxs1, components1, idxs2, components2):
+    # multiply the components of two tensors in order, contracting the indices
+    # that they share.
+    idxs = idxs1 + idxs2
+    pairs = [
+        (p1, p2)
+        for p1, idx1 in enumerate(idxs)
+        for p2, idx2 in enumerate(idxs)
+        if p1 < p2 and idx1.name == idx2.name
+    ]
+    product = {}
+    for key1, value1 in components1.items():
+        for key2, value2 in components2.items():
+            key = key1 + key2
+            if all(key[p1] == key[p2] for p1, p2 in pairs):
+                value = value1 * value2
+                if value != 0:
+                    product[key] = value
+    if not all(value.is_commutative for value in product.values()):
+        # differential operators must be applied before they can be summed.
+        return idxs, product
+    return _sum_repeated(idxs, product)
+
+
+def _expand_sparse(expr):
+    # evaluate a tensor expression, returning its free indices along with the
+    # nonzero components keyed by the values of those indices.
+    if isinstance(expr, TensAdd):
+        free = None
+        terms = defaultdict(list)
+        for term in expr.args:
+            idxs, components = _sum_repeated(*_expand_sparse(term))
+            if free is None:
+                free = idxs
+            for key, value in _permute_components(components, idxs, free).items():
+                terms[key].append(value)
+        return free, {key: Add(*values) for key, values in terms.items()}
+    if isinstance(expr, TensMul):
+        idxs, components = [], {(): S.One}
+        for factor in expr.args:
+            idxs, components = _multiply_components(
+                idxs, components, *_expand_sparse(factor)
+            )
+        return idxs, components
+    if isinstance(expr, TensExpr):
+        return _sum_repeated(expr.get_indices(), nonzero_components(expr._array))
+    return [], {(): expr}
+
+
+def expand_array(expr, idxs=None, sparse=None):
     """
     Evaluate a tensor expression and return the result as an array.
 
@@ -316,6 +611,10 @@ def expand_array(expr, idxs=None):
         Symbolic expression of tensors.
     idxs : TensorIndex
         Indices that encode the covariance and contravariance of the result.
+    sparse : bool
+        Whether or not to evaluate the expression by multiplying and contracting
+        only the nonzero components of the tensors involved, returning a sparse
+        array. Defaults to doing so when any of the tensors are sparse.
     """
     repl = Repl()
 
@@ -324,9 +623,19 @@ def expand_array(expr, idxs=None):
             repl.update(arg._repl)
             for metric in arg.index_types:
                 repl.update(metric._repl)
+            if sparse is None and arg.is_sparse:
+                sparse = True
 
     if idxs is None:
         idxs = TensMul(expr).get_free_indices()
+    if sparse:
+        free, components = _sum_repeated(*_expand_sparse(expr))
+        components = _permute_components(components, free, idxs)
+        if not idxs:
+            return components.get((), S.Zero)
+        shape = tuple(int(idx.tensor_index_type.dim) for idx in idxs)
+        return sparse_array(components, shape)
+    repl = Repl({key: dense_array(array) for key, array in repl.items()})
     return expr.replace_with_arrays(repl, idxs)
 
 
@@ -346,7 +655,7 @@ def expand_tensor(symbol, expr, metric, idxs=None, **kwargs):
         Indices that encode the covariance and contravariance of the result.
     """
     result = expand_array(expr, idxs)
-    if not isinstance(result, Array):
+    if not isinstance(result, NDimArray):
         return result
     if idxs is None:
         idxs = TensMul(expr).get_free_indices()
@@ -0,0 +1,56 @@
+import os
+
+from riccipy.cache import CurvatureCache
+from riccipy.metric import *
+from riccipy.sparse import is_sparse, nonzero_components
+from riccipy.tensor import *
+from sympy import Array, diag, sin, symbols
+
+
+def _generate_sphere(cache):
+    coords = symbols("theta phi", real=True)
+    th, ph = coords
+    g = Metric("g", coords, diag(1, sin(th) ** 2), cache=cache)
+    return (coords, th, ph, g)
+
+
+def test_CurvatureCache(tmp_path):
+    cache = CurvatureCache(str(tmp_path))
+    (coords, th, ph, g) = _generate_sphere(cache)
+    key = cache.key(coords, g.as_array())
+    assert cache.load(key, "riemann") is None
+    R = g.riemann.as_array()
+    assert cache.load(key, "riemann") == R
+    assert cache.load(key, "christoffel") == g.christoffel.as_array()
+    (coords, th, ph, h) = _generate_sphere(cache)
+    assert cache.key(coords, h.as_array()) == key
+    assert h.riemann.as_array() == R
+    res = cache.load(key, "riemann", sparse=True)
+    assert is_sparse(res)
+    assert nonzero_components(res) == nonzero_components(R)
+    cache.clear()
+    assert cache.load(key, "riemann") is None
+
+
+def test_CurvatureCache_symbols(tmp_path):
+    cache = CurvatureCache(str(tmp_path))
+    coords = symbols("t r theta phi", real=True)
+    t, r, th, ph = coords
+    schw = diag(1 - 1 / r, -1 / (1 - 1 / r), -(r ** 2), -(r ** 2) * sin(th) ** 2)
+    Metric("g", coords, schw, cache=cache).christoffel
+    # a plain symbol named like a coordinate is not picked up when loading.
+    plain = symbols("t r theta phi")
+    hash(1 - 1 / plain[1] + sin(plain[2]))
+    h = Metric("h", coords, schw, cache=cache)
+    k = Metric("k", coords, schw)
+    assert h.christoffel.as_array() == k.christoffel.as_array()
+    assert h.riemann.as_array() == k.riemann.as_array()
+    assert plain[1].is_real is None
+
+
+def test_CurvatureCache_evict(tmp_path):
+    cache = CurvatureCache(str(tmp_path), max_size=0)
+    x = symbols("x")
+    cache.store("key", "value", Array([x, 0]))
+    assert cache.load("key", "value") is None
+    assert not os.listdir(str(tmp_path))
@@ -0,0 +1,70 @@
+import numpy as np
+
+from riccipy.geodesic import *
+from riccipy.metric import *
+from sympy import diag, sin, symbols
+
+
+def _generate_schwarzschild():
+    coords = symbols("t r theta phi", real=True)
+    t, r, th, ph = coords
+    M = symbols("M", positive=True)
+    f = 1 - 2 * M / r
+    schw = diag(-f, 1 / f, r ** 2, r ** 2 * sin(th) ** 2)
+    g = Metric("g", coords, schw, method="components")
+    return (coords, t, r, th, ph, M, g)
+
+
+def _circular_orbits(geodesics, rs):
+    count = len(rs)
+    x0 = np.stack([np.zeros(count), rs, np.full(count, np.pi / 2), np.zeros(count)], 1)
+    u0 = np.zeros((count, 4))
+    u0[:, 3] = 1 / np.sqrt(rs ** 2 * (rs - 3))
+    return x0, geodesics.normalize(x0, u0, -1)
+
+
+def test_Geodesics():
+    (coords, t, r, th, ph, M, g) = _generate_schwarzschild()
+    geodesics = Geodesics(g, {M: 1})
+    rs = np.linspace(6.0, 20.0, 50)
+    x0, u0 = _circular_orbits(geodesics, rs)
+    x, u = geodesics.integrate(x0, u0, np.linspace(0, 200, 6))
+    assert x.shape == u.shape == (50, 6, 4)
+    assert np.allclose(x[:, :, 1], rs[:, None])
+    assert np.allclose(u[:, :, 3], u0[:, None, 3])
+    f = 1 - 2 / x[:, :, 1]
+    norm = -f * u[:, :, 0] ** 2 + x[:, :, 1] ** 2 * u[:, :, 3] ** 2
+    assert np.allclose(norm, -1)
+
+
+def test_Geodesics_singularity():
+    (coords, t, r, th, ph, M, g) = _generate_schwarzschild()
+    geodesics = Geodesics(g, {M: 1})
+    x0 = np.array([[0.0, 10.0, np.pi / 2, 0.0]])
+    u0 = geodesics.normalize(x0, [[0.0, 0.0, 0.0, 0.0]], -1)
+    x, u = geodesics.integrate(x0, u0, [0.0, 20.0, 40.0])
+    assert 0 < x[0, 1, 1] < 10
+    assert np.all(np.isnan(x[0, 2]))
+
+
+def test_Geodesics_flat():
+    coords = symbols("t x y", real=True)
+    eta = Metric("eta", coords, diag(-1, 1, 1))
+    geodesics = Geodesics(eta)
+    x0 = np.zeros((2, 3))
+    u0 = geodesics.normalize(x0, [[0, 1, 0], [0, 0, 1]], 0)
+    assert np.allclose(u0[:, 0], 1)
+    x, u = geodesics.integrate(x0, u0, [0, 1, 2])
+    assert np.allclose(x[0, :, 1], [0, 1, 2])
+    assert np.allclose(x[1, :, 2], [0, 1, 2])
+
+
+def test_Geodesics_workers():
+    (coords, t, r, th, ph, M, g) = _generate_schwarzschild()
+    geodesics = Geodesics(g, {M: 1})
+    x0, u0 = _circular_orbits(geodesics, np.linspace(6.0, 20.0, 9))
+    lambdas = np.linspace(0, 100, 3)
+    serial = geodesics.integrate(x0, u0, lambdas)
+    parallel = geodesics.integrate(x0, u0, lambdas, workers=2)
+    assert np.array_equal(serial[0], parallel[0])
+    assert np.array_equal(serial[1], parallel[1])
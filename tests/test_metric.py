@@ -1,7 +1,21 @@
 from riccipy.metric import *
 from riccipy.partial import *
+from riccipy.sparse import dense_array
 from riccipy.tensor import *
-from sympy import Expr, diag, eye, sin, symbols, tensorproduct, zeros
+from pytest import raises
+from sympy import (
+    Expr,
+    Function,
+    cos,
+    diag,
+    eye,
+    flatten,
+    simplify,
+    sin,
+    symbols,
+    tensorproduct,
+    zeros,
+)
 
 
 def _generate_schwarzschild():
@@ -31,6 +45,34 @@ def test_SpacetimeMetric():
     array2 = g.as_array()
     assert rev_sig == (-1, 1, 1, 1)
     assert array1 == -1 * array2
+    assert g.metric.as_array() == array2
+    diff = g.as_inverse() + Array(schw.inv())
+    assert all(simplify(value) == 0 for value in flatten(diff))
+    assert expand_array(g(-mu, -nu)) == array2
+
+
+def test_SpacetimeMetric_reverse_signature():
+    coords = symbols("theta phi", real=True)
+    th, ph = coords
+    g = SpacetimeMetric("g", coords, diag(1, sin(th) ** 2))
+    g.determinant
+    assert g.ricci_scalar == 2
+    g.reverse_signature()
+    h = SpacetimeMetric("h", coords, diag(-1, -sin(th) ** 2))
+    assert g.ricci_scalar == h.ricci_scalar == -2
+    assert g.determinant == h.determinant
+
+
+def test_SpacetimeMetric_reverse_signature_sparse():
+    coords = symbols("theta phi", real=True)
+    th, ph = coords
+    g = SpacetimeMetric("g", coords, diag(1, sin(th) ** 2), sparse=True)
+    a, b, c, d = indices("a b c d", g)
+    R = g.riemann
+    assert expand_array(R(-a, -b, -c, -d))[0, 1, 0, 1] == sin(th) ** 2
+    g.reverse_signature()
+    assert expand_array(R(-a, -b, -c, -d))[0, 1, 0, 1] == -sin(th) ** 2
+    assert expand_array(R(-a, -b, -c, -d) * R(a, b, c, d)) == 4
 
 
 def test_Metric_density():
@@ -45,6 +87,9 @@ def test_Metric_determinant():
     (coords, t, r, th, ph, schw, g, mu, nu) = _generate_schwarzschild()
     res = g.determinant
     assert res.equals(-(r ** 4) * sin(th) ** 2)
+    assert g.determinant is res
+    g.subs({r: 2 * r})
+    assert g.determinant.equals(-16 * r ** 4 * sin(th) ** 2)
 
 
 def test_Metric_christoffel():
@@ -56,6 +101,29 @@ def test_Metric_christoffel():
     )
 
 
+def test_Metric_christoffel_components():
+    (coords, t, r, th, ph, schw, g, mu, nu) = _generate_schwarzschild()
+    h = SpacetimeMetric("h", coords, schw, timelike=True, method="components")
+    assert h.method == "components"
+    gamma1 = g.christoffel.as_array()
+    gamma2 = h.christoffel.as_array()
+    assert all(simplify(c) == 0 for c in flatten(gamma1 - gamma2))
+    with raises(ValueError):
+        Metric("h", coords, schw, method="unknown")
+
+
+def test_Metric_sparse():
+    (coords, t, r, th, ph, schw, g, mu, nu) = _generate_schwarzschild()
+    h = SpacetimeMetric("h", coords, schw, timelike=True, sparse=True)
+    assert h.is_sparse
+    assert h.christoffel.is_sparse
+    assert len(h.christoffel.as_components()) == 13
+    gamma = g.christoffel.as_array() - dense_array(h.christoffel.as_array())
+    assert all(simplify(c) == 0 for c in flatten(gamma))
+    assert h.riemann.is_sparse
+    assert all(simplify(c) == 0 for c in h.ricci_tensor.as_components().values())
+
+
 def test_Metric_riemann():
     (coords, t, r, th, ph, schw, g, mu, nu) = _generate_schwarzschild()
     rh, si = indices("rho sigma", g)
@@ -71,10 +139,82 @@ def test_Metric_riemann():
     assert all(expand_array(expr).applyfunc(lambda c: c.equals(0)).args[0])
 
 
+def test_Metric_riemann_components():
+    th, ph = symbols("theta phi", real=True)
+    g = Metric("g", (th, ph), diag(1, sin(th) ** 2))
+    R = g.riemann.as_array()
+    assert R[0, 1, 0, 1] == sin(th) ** 2
+    assert R[0, 1, 1, 0] == -sin(th) ** 2
+    assert R[1, 0, 0, 1] == -1
+    assert R[0, 0, 0, 1] == R[1, 1, 0, 0] == 0
+
+
+def test_Metric_compute():
+    (coords, t, r, th, ph, schw, g, mu, nu) = _generate_schwarzschild()
+    h = SpacetimeMetric("h", coords, schw, method="components")
+    christoffel, riemann, weyl = h.compute("christoffel", "riemann", "weyl", workers=2)
+    assert h.workers is None
+    assert weyl is h.weyl
+    k = SpacetimeMetric("k", coords, schw, method="components")
+    assert christoffel.as_array() == k.christoffel.as_array()
+    assert riemann.as_array() == k.riemann.as_array()
+    assert weyl.as_array() == k.weyl.as_array()
+    with raises(ValueError):
+        h.compute("ricci")
+
+
+def test_Metric_compute_symbols():
+    # a plain symbol named like a coordinate must neither replace the
+    # coordinate in components computed by other processes nor change.
+    plain = symbols("t r theta phi")
+    hash(1 - 1 / plain[1] + sin(plain[2]))
+    (coords, t, r, th, ph, schw, g, mu, nu) = _generate_schwarzschild()
+    h = SpacetimeMetric("h", coords, schw, method="components")
+    (riemann,) = h.compute("riemann", workers=2)
+    k = SpacetimeMetric("k", coords, schw, method="components")
+    assert riemann.as_array() == k.riemann.as_array()
+    assert riemann[1, 3, 2, 3] == 0
+    assert plain[1].is_real is None
+
+
+def test_Metric_subs():
+    coords = symbols("t r theta phi", real=True)
+    t, r, th, ph = coords
+    M = symbols("M", positive=True)
+    f = 1 - 2 * M / r
+    schw = diag(-f, 1 / f, r ** 2, r ** 2 * sin(th) ** 2)
+    for sparse in (False, True):
+        g = Metric("g", coords, schw, sparse=sparse)
+        R = g.riemann
+        g.ricci_scalar
+        g.subs({M: 3})
+        h = Metric("h", coords, schw.subs(M, 3))
+        assert g._riemann is R
+        for name in ("christoffel", "riemann"):
+            diff = getattr(g, name).as_array() - getattr(h, name).as_array()
+            assert all(simplify(value) == 0 for value in flatten(diff))
+        assert g.ricci_scalar.equals(0)
+        g.subs({th: 2 * th})
+        assert g._riemann is None
+        assert g._ricci_scalar is None
+
+
 def test_Metric_ricci_tensor():
     (coords, t, r, th, ph, schw, g, mu, nu) = _generate_schwarzschild()
     R = g.ricci_tensor
     assert zeros(4).equals(R.as_array())
+    assert g._riemann is None
+
+
+def test_Metric_ricci_tensor_direct():
+    coords = symbols("t x y z", real=True)
+    a = Function("a")(coords[0])
+    frw = diag(-1, a ** 2, a ** 2, a ** 2)
+    g = Metric("g", coords, frw)
+    h = Metric("h", coords, frw)
+    h.riemann
+    assert g.ricci_tensor.as_array() == h.ricci_tensor.as_array()
+    assert g._riemann is None
 
 
 def test_Metric_ricci_scalar():
@@ -108,3 +248,49 @@ def test_Metric_weyl():
     assert all(expand_array(expr).applyfunc(lambda c: c.equals(0)).args[0])
     expr = C(-rh, -si, -mu, -nu) + C(-rh, -mu, -nu, -si) + C(-rh, -nu, -si, -mu)
     assert all(expand_array(expr).applyfunc(lambda c: c.equals(0)).args[0])
+
+
+def test_Metric_invariants():
+    from riccipy.simplification import SimplificationPolicy
+
+    (coords, t, r, th, ph, schw, g, mu, nu) = _generate_schwarzschild()
+    g = Metric("g", coords, schw, simplification=SimplificationPolicy())
+    assert g.kretschmann == 12 / r ** 6
+    assert g.kretschmann is g.kretschmann
+    assert g.weyl_square == 12 / r ** 6
+    assert g.ricci_square == 0
+    assert g.chern_pontryagin == 0
+    sphere = Metric("h", (th, ph), diag(r ** 2, r ** 2 * sin(th) ** 2))
+    assert simplify(sphere.kretschmann) == 4 / r ** 4
+    assert simplify(sphere.ricci_square) == 2 / r ** 4
+    with raises(ValueError):
+        sphere.chern_pontryagin
+
+
+def test_Metric_chern_pontryagin():
+    coords = symbols("t r theta phi", real=True)
+    t, r, th, ph = coords
+    M, a = symbols("M a", positive=True)
+    sigma = r ** 2 + a ** 2 * cos(th) ** 2
+    delta = r ** 2 - 2 * M * r + a ** 2
+    kerr = zeros(4)
+    kerr[0, 0] = -(1 - 2 * M * r / sigma)
+    kerr[0, 3] = kerr[3, 0] = -2 * M * a * r * sin(th) ** 2 / sigma
+    kerr[1, 1] = sigma / delta
+    kerr[2, 2] = sigma
+    kerr[3, 3] = sin(th) ** 2 * (
+        r ** 2 + a ** 2 + 2 * M * r * a ** 2 * sin(th) ** 2 / sigma
+    )
+    g = Metric("g", coords, kerr, method="components")
+    x = cos(th)
+    expect = (
+        96
+        * a
+        * M ** 2
+        * r
+        * x
+        * (3 * r ** 2 - a ** 2 * x ** 2)
+        * (r ** 2 - 3 * a ** 2 * x ** 2)
+    ) / sigma ** 6
+    values = {M: 1.0, a: 0.5, r: 3.0, th: 0.3}
+    assert abs((g.chern_pontryagin - expect).subs(values).evalf()) < 1e-12
@@ -0,0 +1,49 @@
+import json
+
+from pytest import raises
+
+from riccipy.metrics import (
+    INDEX_PATH,
+    Query,
+    build_index,
+    data,
+    find,
+    metric_data,
+)
+
+
+def test_index_up_to_date():
+    with open(INDEX_PATH) as stream:
+        assert json.load(stream) == build_index()
+
+
+def test_find():
+    assert "schwarzschild" in find(symmetries="spherical")
+    assert "schwarzschild" in find("schwarzschild", coords="spherical")
+
+
+def test_data():
+    entry = data("minkowski", coords="cartesian")
+    assert entry["metric"].shape == (4, 4)
+    assert len(entry["coords"]) == 4
+    # only the requested metric is loaded.
+    assert not all("metric" in entry for entry in metric_data)
+
+
+def test_Query():
+    spherical = set(find(symmetries="spherical"))
+    static = set(find(symmetries="static"))
+    both = Query(symmetries="spherical") & Query(symmetries="static")
+    either = Query(symmetries="spherical") | Query(symmetries="static")
+    assert set(find(both)) == spherical & static
+    assert set(find(either)) == spherical | static
+    others = (~Query(symmetries="spherical")).entries()
+    assert len(others) + len(Query(symmetries="spherical").entries()) == len(
+        metric_data
+    )
+    assert all("spherical" not in entry.get("symmetry", "") for entry in others)
+    assert find(Query("fluid"), coords="spherical") == find("fluid", coords="spherical")
+    entries = Query(name="schwarzschild").entries()
+    assert entries and all(entry["name"] == "schwarzschild" for entry in entries)
+    with raises(KeyError):
+        data("no such metric")
@@ -0,0 +1,116 @@
+import os
+import shutil
+from importlib.util import find_spec
+
+import numpy as np
+from pytest import mark, raises
+
+from riccipy.metric import *
+from riccipy.numerical import *
+from riccipy.tensor import *
+from sympy import cos, diag, lambdify, sin, symbols
+
+
+def _generate_kerr():
+    coords = symbols("t r theta phi", real=True)
+    t, r, th, ph = coords
+    M, a = symbols("M a", positive=True)
+    rho2 = r ** 2 + a ** 2 * cos(th) ** 2
+    delta = r ** 2 - 2 * M * r + a ** 2
+    gtp = -2 * M * a * r * sin(th) ** 2 / rho2
+    gpp = (r ** 2 + a ** 2 + 2 * M * a ** 2 * r * sin(th) ** 2 / rho2) * sin(th) ** 2
+    kerr = diag(-(1 - 2 * M * r / rho2), rho2 / delta, rho2, gpp)
+    kerr[0, 3] = kerr[3, 0] = gtp
+    g = Metric("g", coords, kerr, method="components")
+    return (coords, t, r, th, ph, M, a, g)
+
+
+def test_NumericalArray():
+    (coords, t, r, th, ph, M, a, g) = _generate_kerr()
+    arr = g.christoffel.as_array()
+    narr = NumericalArray((r, th, M, a), arr)
+    point = (3.0, 0.4, 1.0, 0.5)
+    expected = np.array(lambdify((r, th, M, a), arr)(*point), dtype=float)
+    assert np.allclose(narr(*point), expected)
+    assert np.allclose(narr[1, 2, 2](*point), expected[1, 2, 2])
+    assert narr[0, 1, 1](*point) == 0
+
+
+def test_NumericalArray_modules():
+    x, y = symbols("x y", real=True)
+    narr = NumericalArray(
+        (x,), [[sin(x) ** 2 + y, 0], [0, sin(x) ** 2]], modules="math"
+    )
+    assert narr(0.0).tolist() == [[y, 0], [0, 0.0]]
+    assert narr[1, 1](1.0) == np.sin(1.0) ** 2
+
+
+def test_NumericalArray_lazy():
+    x, y = symbols("x y", real=True)
+    narr = NumericalArray((x, y), [[x * y, sin(x)], [0, cos(y)]], compile_array=False)
+    assert narr._lambda is None
+    assert all(func is None for func in narr._generator)
+    assert narr[0, 1](0.5, 0.0) == np.sin(0.5)
+    assert sum(func is not None for func in narr._generator) == 1
+    row = narr[1]
+    assert row.shape == (2,)
+    assert row[1](0.0, 0.0) == 1.0
+    assert narr._lambda is None
+    assert np.allclose(narr(2.0, 0.0), [[0.0, np.sin(2.0)], [0.0, 1.0]])
+
+
+def test_NumericalArray_batch():
+    (coords, t, r, th, ph, M, a, g) = _generate_kerr()
+    narr = NumericalArray((r, th, M, a), g.as_array())
+    rs = np.linspace(3.0, 10.0, 5)
+    ths = np.linspace(0.1, 3.0, 5)
+    values = narr(rs, ths, 1.0, 0.5)
+    assert values.shape == (5, 4, 4)
+    assert values.dtype == float
+    for i in range(5):
+        assert np.allclose(values[i], narr(rs[i], ths[i], 1.0, 0.5))
+    grid = narr.batch(*np.meshgrid(rs, ths), 1.0, 0.0)
+    assert grid.shape == (5, 5, 4, 4)
+    assert np.all(grid[..., 0, 1] == 0)
+    assert np.all(grid[..., 0, 3] == 0)
+
+
+@mark.skipif(shutil.which(os.environ.get("CC", "cc")) is None, reason="no C compiler")
+def test_NumericalArray_c(tmp_path, monkeypatch):
+    monkeypatch.setenv("XDG_CACHE_HOME", str(tmp_path))
+    (coords, t, r, th, ph, M, a, g) = _generate_kerr()
+    arr = g.christoffel.as_array()
+    narr = NumericalArray((r, th, M, a), arr, backend="c")
+    expected = NumericalArray((r, th, M, a), arr)
+    rs = np.linspace(3.0, 10.0, 7)
+    assert np.allclose(narr(rs, 0.4, 1.0, 0.5), expected(rs, 0.4, 1.0, 0.5))
+    assert np.allclose(narr(3.0, 0.4, 1.0, 0.5), expected(3.0, 0.4, 1.0, 0.5))
+    assert len(list(tmp_path.glob("riccipy/compiled/*.so"))) == 1
+    NumericalArray((r, th, M, a), arr, backend="c")
+    assert len(list(tmp_path.glob("riccipy/compiled/*.so"))) == 1
+    with raises(ValueError):
+        NumericalArray((r, th), arr, backend="c")
+    with raises(ValueError):
+        NumericalArray((r, th), arr, backend="fortran")
+
+
+@mark.skipif(find_spec("numba") is None, reason="numba is not installed")
+def test_NumericalArray_numba():
+    from numba import njit
+
+    (coords, t, r, th, ph, M, a, g) = _generate_kerr()
+    arr = g.christoffel.as_array()
+    narr = NumericalArray((r, th, M, a), arr, backend="numba")
+    expected = NumericalArray((r, th, M, a), arr)
+    rs = np.linspace(3.0, 10.0, 7)
+    assert np.allclose(narr(rs, 0.4, 1.0, 0.5), expected(rs, 0.4, 1.0, 0.5))
+    assert narr[1, 2, 2](3.0, 0.4, 1.0, 0.5) == expected[1, 2, 2](3.0, 0.4, 1.0, 0.5)
+    kernel = narr.kernel
+
+    @njit
+    def evaluate(r, th):
+        out = np.zeros((4, 4, 4))
+        kernel(r, th, 1.0, 0.5, out)
+        return out
+
+    assert np.allclose(evaluate(3.0, 0.4), expected(3.0, 0.4, 1.0, 0.5))
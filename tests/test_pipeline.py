@@ -0,0 +1,115 @@
+import json
+import multiprocessing
+import sys
+
+from riccipy.metrics import Query, metric_data
+from riccipy.pipeline import *
+from riccipy.simplification import SimplificationPolicy
+from pytest import mark, raises
+
+# the patches of the following tests only reach workers forked from this process.
+forked = mark.skipif(
+    multiprocessing.get_context().get_start_method() != "fork",
+    reason="workers are not forked",
+)
+
+
+def _by_module(records):
+    return {record["module"]: record for record in records}
+
+
+def test_sweep():
+    records = _by_module(
+        sweep(Query(symmetries="maximal"), ["ricci_scalar"], workers=2)
+    )
+    assert len(records) == 8
+    assert all(record["status"] == "ok" for record in records.values())
+    assert records["minkowski_1"]["properties"] == {"ricci_scalar": "0"}
+    assert records["de_sitter_1"]["name"] == "de sitter"
+    records = _by_module(sweep(["minkowski", "minkowski"], ["christoffel"]))
+    assert set(records) == {"minkowski_1", "minkowski_2", "minkowski_3"}
+    christoffel = records["minkowski_1"]["properties"]["christoffel"]
+    assert christoffel == {"shape": [4, 4, 4], "components": {}}
+    with raises(ValueError):
+        list(sweep(["minkowski"], ["ricci"]))
+
+
+@forked
+def test_sweep_failures(monkeypatch):
+    import time
+    import riccipy.metric
+
+    riemann_components = riccipy.metric.riemann_components
+
+    def slow(*args, **kwargs):
+        time.sleep(60)
+        return riemann_components(*args, **kwargs)
+
+    monkeypatch.setattr(riccipy.metric, "riemann_components", slow)
+    records = _by_module(
+        sweep(["minkowski"], ["christoffel", "riemann"], timeout=2, workers=3)
+    )
+    assert len(records) == 3
+    for record in records.values():
+        assert record["status"] == "timeout"
+        assert record["error"] == "exceeded 2 seconds"
+        assert list(record["properties"]) == ["christoffel"]
+
+
+@forked
+@mark.skipif(sys.platform != "linux", reason="requires /proc/self/statm")
+def test_sweep_memory_limit(monkeypatch):
+    import resource
+    import riccipy.metric
+
+    riemann_components = riccipy.metric.riemann_components
+
+    def allocating(*args, **kwargs):
+        # the forked workers inherit the patch, so that the limit is exceeded
+        # while computing the Riemann tensor rather than importing the entry.
+        bytearray(2 ** 30)
+        return riemann_components(*args, **kwargs)
+
+    monkeypatch.setattr(riccipy.metric, "riemann_components", allocating)
+    with open("/proc/self/statm") as stream:
+        size = int(stream.read().split()[0]) * resource.getpagesize()
+    records = _by_module(
+        sweep(["kerr"], ["christoffel", "riemann"], memory_limit=size + 2 ** 28)
+    )
+    assert records["kerr_1"]["status"] == "memory"
+    assert list(records["kerr_1"]["properties"]) == ["christoffel"]
+
+
+def test_sweep_policy_timeout():
+    # the time limit of the policy must not lift the time limit of the entry.
+    policy = SimplificationPolicy(timeout=60)
+    records = _by_module(
+        sweep(["kerr"], ["christoffel", "riemann"], timeout=1, simplification=policy)
+    )
+    assert records["kerr_1"]["status"] == "timeout"
+    assert records["kerr_1"]["error"] == "exceeded 1 seconds"
+
+
+def test_sweep_close():
+    from multiprocessing import active_children
+
+    entries = {entry.module: entry for entry in metric_data}
+    entries = [entries["kerr_1"], entries["minkowski_1"]]
+    records = sweep(entries, ["riemann", "kretschmann"], workers=2)
+    assert next(records)["module"] == "minkowski_1"
+    assert len(active_children()) == 1
+    records.close()
+    assert active_children() == []
+
+
+def test_write_json_lines(tmp_path):
+    path = str(tmp_path / "sweep.jsonl")
+    count = write_json_lines(sweep(["minkowski"], ["ricci_scalar"]), path)
+    assert count == 3
+    with open(path) as stream:
+        records = [json.loads(line) for line in stream]
+    assert sorted(record["module"] for record in records) == [
+        "minkowski_1",
+        "minkowski_2",
+        "minkowski_3",
+    ]
@@ -0,0 +1,87 @@
+from riccipy.metric import *
+from riccipy.parallel import TimeoutExpired, time_limit
+from riccipy.simplification import *
+from pytest import raises
+from sympy import Array, cos, diag, sin, symbols, trigsimp
+
+
+def _generate_sphere():
+    coords = symbols("theta phi", real=True)
+    th, ph = coords
+    sphere = diag(1, sin(th) ** 2)
+    return (coords, th, ph, sphere)
+
+
+def test_SimplificationPolicy():
+    x = symbols("x")
+    policy = SimplificationPolicy(("cancel", "expand"))
+    assert policy((x ** 2 - 1) / (x - 1) * (x + 2)) == x ** 2 + 3 * x + 2
+    assert SimplificationPolicy((trigsimp,))(sin(x) ** 2 + cos(x) ** 2) == 1
+    assert SimplificationPolicy(())(x / x ** 2) == x / x ** 2
+    with raises(ValueError):
+        SimplificationPolicy(("factor",))
+
+
+def test_SimplificationPolicy_apply():
+    x, y = symbols("x y")
+    value = (x ** 2 - 1) / (x - 1)
+    policy = SimplificationPolicy(properties=("christoffel",))
+    array = Array([[value, 0], [0, value]])
+    assert policy.apply("christoffel", array) == Array([[x + 1, 0], [0, x + 1]])
+    assert policy.apply("riemann", array) == array
+    assert policy.apply("christoffel", value * y) == x * y + y
+
+
+def test_SimplificationPolicy_timeout():
+    x = symbols("x")
+    expr = x / (x + 1) + 1
+    policy = SimplificationPolicy(("together", _sleep, "expand"), timeout=0.05)
+    assert policy(expr) == (2 * x + 1) / (x + 1)
+
+
+def test_SimplificationPolicy_enclosing_timeout():
+    import time
+
+    x = symbols("x")
+    policy = SimplificationPolicy(("cancel", _sleep), timeout=60)
+    start = time.monotonic()
+    with raises(TimeoutExpired):
+        with time_limit(0.2):
+            policy(x / x ** 2)
+            time.sleep(1)
+    assert time.monotonic() - start < 1
+    with time_limit(5):
+        assert policy(x / x ** 2) == 1 / x
+
+
+def test_SimplificationPolicy_workers():
+    # a plain symbol named like a coordinate is left alone by the workers.
+    plain = symbols("theta")
+    hash(sin(plain) + 1)
+    (coords, th, ph, sphere) = _generate_sphere()
+    value = (sin(th) ** 2 - 1) / (sin(th) - 1)
+    policy = SimplificationPolicy()
+    array = policy.apply("christoffel", Array([value, value + 1]), workers=2)
+    assert array[1] - array[0] == 1
+    assert array[0] - sin(th) == 1
+    g = Metric("g", coords, sphere, workers=2, simplification=policy)
+    assert g.ricci_scalar == 2
+    assert plain.is_real is None
+
+
+def test_Metric_simplification():
+    (coords, th, ph, sphere) = _generate_sphere()
+    policy = SimplificationPolicy(("cancel", "trigsimp"))
+    g = Metric("g", coords, sphere, simplification=policy)
+    h = Metric("h", coords, sphere)
+    assert g.christoffel[0, 1, 1] == -sin(2 * th) / 2
+    assert h.christoffel[0, 1, 1] == -sin(th) * cos(th)
+    assert g.ricci_scalar == 2
+    assert g.riemann[0, 1, 0, 1].equals(sin(th) ** 2)
+
+
+def _sleep(expr):
+    import time
+
+    time.sleep(1)
+    return expr
@@ -1,6 +1,17 @@
 from riccipy.metric import *
 from riccipy.tensor import *
-from sympy import Array, diag, eye, simplify, sin, symbols
+from sympy import (
+    Array,
+    cos,
+    diag,
+    expand,
+    eye,
+    simplify,
+    sin,
+    symbols,
+    tensorcontraction,
+    tensorproduct,
+)
 from sympy.tensor.tensor import TensExpr, TensMul
 
 
@@ -71,6 +82,72 @@ def test_Tensor_simplify():
     assert str(T.simplify()[0]) == str(expr_simplified)
 
 
+def test_Tensor_simplify_parallel():
+    (coords, metric) = _generate_simple()
+    x, y, z = coords
+    exprs = [sin(x) ** 2 + cos(x) ** 2, 0, (x ** 2 - 1) / (x - 1)]
+    T = Tensor("T", exprs, metric)
+    assert list(T.simplify(workers=2)) == [1, 0, x + 1]
+    # a plain symbol named like a coordinate is left alone by the workers.
+    plain = symbols("x")
+    hash(plain + 1)
+    V = Tensor("V", exprs, metric)
+    assert V.simplify(workers=2)[2] - x == 1
+    assert plain.is_real is None
+    U = Tensor("U", exprs, metric)
+    assert list(U.simplify(timeout=1e-6, fallback=expand)) == [
+        expand(exprs[0]),
+        0,
+        expand(exprs[2]),
+    ]
+
+
+def test_Tensor_simplify_symmetry(monkeypatch):
+    from sympy.tensor.tensor import TensorSymmetry
+    import riccipy.tensor
+
+    (coords, metric) = _generate_simple()
+    x, y, z = coords
+    a = sin(x) ** 2 + cos(x) ** 2
+    b = (y ** 2 - 1) / (y - 1)
+    matrix = [[0, a, b], [-a, 0, -b], [-b, b, 0]]
+    F = Tensor(
+        "F",
+        matrix,
+        metric,
+        symmetry=TensorSymmetry.fully_symmetric(-2),
+        covar=(-1, -1),
+    )
+    simplified = []
+
+    def record(function, items, workers=None):
+        simplified.extend(items)
+        return [function(item) for item in items]
+
+    monkeypatch.setattr(riccipy.tensor, "parallel_map", record)
+    assert F.simplify() == Array([[0, 1, y + 1], [-1, 0, -y - 1], [-y - 1, y + 1, 0]])
+    assert simplified == [a, b]
+
+
+def test_Tensor_as_inverse():
+    from pytest import raises
+    from sympy import Matrix
+
+    (coords, metric) = _generate_simple()
+    x, y, z = coords
+    matrix = Matrix([[x, 0, y], [0, z, 0], [y, 0, -x]])
+    for sparse in (False, True):
+        T = Tensor("T", matrix, metric, sparse=sparse)
+        inverse = T.as_inverse()
+        assert (Matrix(inverse.tolist()) * matrix).applyfunc(simplify) == eye(3)
+        assert inverse[0, 1] == inverse[1, 2] == 0
+        assert inverse[1, 1] == 1 / z
+    with raises(ValueError):
+        Tensor("U", diag(x, 0, z), metric).as_inverse()
+    with raises(ValueError):
+        Tensor("V", [[x, y], [x, y]], metric).as_inverse()
+
+
 def test_Tensor_covariance_transform():
     (coords, t, r, th, ph, schw, g, mu, nu) = _generate_schwarzschild()
     E, p1, p2, p3 = symbols("E p_1:4", positive=True)
@@ -85,6 +162,93 @@ def test_Tensor_covariance_transform():
     assert res[3].equals(expect[3])
 
 
+def test_Tensor_sparse():
+    from sympy import ImmutableSparseNDimArray
+
+    (coords, t, r, th, ph, schw, g, mu, nu) = _generate_schwarzschild()
+    E, p1 = symbols("E p_1", positive=True)
+    p = Tensor("p", [E, p1, 0, 0], g, sparse=True)
+    assert p.is_sparse
+    assert isinstance(p.as_array(), ImmutableSparseNDimArray)
+    assert p.as_components() == {(0,): E, (1,): p1}
+    res = p.covariance_transform(-mu)
+    assert isinstance(res, ImmutableSparseNDimArray)
+    assert res[0].equals(E * (1 - 1 / r))
+    assert res[1].equals(-p1 / (1 - 1 / r))
+    assert res[2] == res[3] == 0
+
+
+def test_expand_array_sparse():
+    from sympy import ImmutableSparseNDimArray
+    from riccipy.sparse import dense_array
+
+    (coords, t, r, th, ph, schw, g, mu, nu) = _generate_schwarzschild()
+    h = Metric("h", coords, schw, sparse=True)
+    al, be = indices("alpha beta", h)
+    x = Tensor("x", [t, r, th, ph], g)
+    y = Tensor("y", [t, r, th, ph], h, sparse=True)
+    res1 = expand_array(x(mu) * x(-mu))
+    res2 = expand_array(y(al) * y(-al))
+    assert simplify(res1 - res2) == 0
+    res = expand_array(h(al, be))
+    assert isinstance(res, ImmutableSparseNDimArray)
+    assert schw.inv().equals(res.tomatrix())
+    res1 = expand_array(g(-mu, -nu) * x(nu) + x(-mu), [-mu])
+    res2 = expand_array(h(-al, -be) * y(be) + y(-al), [-al])
+    assert all(simplify(c) == 0 for c in res1 - dense_array(res2))
+    assert simplify(expand_array(h(-al, al))) == 4
+
+
+def test_Tensor_covariance_transform_rank3():
+    (coords, t, r, th, ph, schw, g, mu, nu) = _generate_schwarzschild()
+    a = symbols("a0:64")
+    T = Tensor("T", Array(a, (4, 4, 4)), g)
+    si = Index("sigma", g)
+    res = T.covariance_transform(mu, nu, -si)
+    for i, j, k in [(0, 1, 2), (1, 0, 3), (2, 3, 1)]:
+        assert res[i, j, k] == schw[k, k] * T[i, j, k]
+    res = T.covariance_transform(-mu, nu, si)
+    expect = tensorcontraction(tensorproduct(Array(schw), T.as_array()), (1, 2))
+    assert res == expect
+
+
+def test_Tensor_cache():
+    (coords, t, r, th, ph, schw, g, mu, nu) = _generate_schwarzschild()
+    M = symbols("M")
+    x = Tensor("x", [t, M * r, th, ph], g, cache_size=1)
+    hits, misses, maxsize, currsize = x.cache_info()
+    assert maxsize == currsize == 1
+    res1 = x.covariance_transform(-mu)
+    res2 = x.covariance_transform(-nu)
+    assert res1 is res2
+    assert x.cache_info().hits == hits + 1
+    x.covariance_transform(mu)
+    assert x.cache_info().currsize == 1
+    x.subs({M: 2})
+    assert x.cache_info().hits == 0
+    assert x.covariance_transform(-mu)[1].equals(-2 * r / (1 - 1 / r))
+    x.simplify()
+    assert x.cache_info().hits == 0
+
+
+def test_Tensor_cache_metric_subs():
+    coords = symbols("t r theta phi", real=True)
+    t, r, th, ph = coords
+    M = symbols("M")
+    f = 1 - 2 * M / r
+    schw = diag(f, -1 / f, -(r ** 2), -(r ** 2) * sin(th) ** 2)
+    for sparse in (False, True):
+        g = Metric("g", coords, schw, sparse=sparse)
+        mu = indices("mu", g)
+        x = Tensor("x", [1, 1, 0, 0], g, sparse=sparse)
+        assert x.covariance_transform(-mu)[0] == f
+        g.subs({M: 5})
+        assert x.covariance_transform(-mu)[0] == 1 - 10 / r
+        assert expand_array(x(-mu))[0] == 1 - 10 / r
+        g.metric.simplify()
+        assert x.covariance_transform(-mu)[0] == (r - 10) / r
+
+
 def test_AbstractTensor():
     (coords, metric) = _generate_simple()
     T = Tensor("T", coords, metric)